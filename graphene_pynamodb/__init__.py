@@ -1,5 +1,6 @@
 from .fields import (
-    PynamoConnectionField
+    PynamoConnectionField,
+    PynamoNodesField
 )
 from .types import (
     PynamoObjectType,
@@ -7,4 +8,5 @@ from .types import (
     MongoengineInterfaceType
 )
 
-__all__ = ['PynamoObjectType', 'PynamoConnectionField', 'MongoengineInterfaceType', 'MongoengineInterfaceTypeOptions']
+__all__ = ['PynamoObjectType', 'PynamoConnectionField', 'PynamoNodesField',
+           'MongoengineInterfaceType', 'MongoengineInterfaceTypeOptions']
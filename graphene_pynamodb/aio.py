@@ -0,0 +1,337 @@
+"""asyncio execution path.
+
+With an AsyncDynamoClient in the context, under graphql's AsyncioExecutor, connections, node lookups and
+relationships return coroutines reading DynamoDB on the event loop, so sibling fields are read concurrently:
+
+    client = AsyncDynamoClient(region='us-west-2')
+    result = schema.execute(query, executor=AsyncioExecutor(loop), context_value={'pynamodb_async_client': client})
+
+The client signs its requests with botocore and sends them with aiohttp, from the asyncio extra, keeping up to
+max_connections connections open. Point host at DynamoDB Local, or any other stand-in, to test against it.
+"""
+import asyncio
+import json
+from collections import OrderedDict
+from urllib.parse import urlsplit
+
+from botocore.auth import SigV4Auth
+from botocore.awsrequest import AWSRequest
+from botocore.credentials import RefreshableCredentials
+from botocore.exceptions import ClientError
+from botocore.session import get_session
+from pynamodb.constants import BATCH_GET_PAGE_LIMIT
+from pynamodb.exceptions import GetError
+from pynamodb.expressions.projection import create_projection_expression
+from pynamodb.indexes import GlobalSecondaryIndex
+
+from graphene_pynamodb.cache import NOT_FOUND, cache_item, get_cache_ttl, get_cached_item, get_identity_map
+from graphene_pynamodb.loaders import (add_read_items, get_backoff, get_key_chunks, get_keys_and_attributes,
+                                       get_known_items)
+from graphene_pynamodb.planner import (BATCH_GET, EXHAUSTED, INDEX_QUERY, QUERY, SCAN, BatchGetResult,
+                                       ParallelScanResult, get_index_keys)
+from graphene_pynamodb.utils import get_context_value, get_key_map, get_request_store, get_typed_key
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+# name of the async client in the context, its presence turns the asyncio path on
+CONTEXT_KEY = "pynamodb_async_client"
+# name of the async loaders of a request in its context
+LOADERS_KEY = "pynamodb_async_loaders"
+
+TARGET_PREFIX = "DynamoDB_20120810."
+CONTENT_TYPE = "application/x-amz-json-1.0"
+# errors worth another attempt, besides 5xx responses
+RETRYABLE_ERRORS = (
+    "ProvisionedThroughputExceededException", "ThrottlingException", "RequestLimitExceeded", "InternalServerError",
+)
+
+
+def get_async_client(info):
+    """The AsyncDynamoClient of the current request, None when it runs synchronously"""
+    return get_context_value(info, CONTEXT_KEY)
+
+
+class AsyncDynamoClient(object):
+    """DynamoDB client for asyncio, sends the low level API requests and returns their parsed JSON responses.
+
+    Throttled and 5xx requests are retried max_retries times after a jittered backoff, other errors raise
+    botocore's ClientError. Credentials default to botocore's chain, the host to the regional endpoint.
+    """
+
+    def __init__(self, region=None, host=None, credentials=None, max_connections=10, timeout=10.0, max_retries=3,
+                 base_backoff=0.05, max_backoff=2.0):
+        if aiohttp is None:
+            raise ImportError("AsyncDynamoClient needs aiohttp, install graphene-pynamodb[asyncio]")
+        session = get_session()
+        self.region = region or session.get_config_variable("region") or "us-east-1"
+        self.host = (host or "https://dynamodb.%s.amazonaws.com" % self.region).rstrip("/")
+        self.credentials = credentials or session.get_credentials()
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+
+        self._url = self.host if urlsplit(self.host).path else self.host + "/"
+        # an aiohttp session belongs to the loop it was made on
+        self._loop = None
+        self._session = None
+
+    @classmethod
+    def for_model(cls, model, **kwargs):
+        """A client for the region and host in the Meta of model"""
+        kwargs.setdefault("region", getattr(model.Meta, "region", None))
+        kwargs.setdefault("host", getattr(model.Meta, "host", None))
+        return cls(**kwargs)
+
+    async def call(self, operation, params):
+        body = json.dumps(params).encode("utf-8")
+        for attempt in range(self.max_retries + 1):
+            try:
+                status, data = await self._request(operation, body)
+            except aiohttp.ClientConnectionError:
+                # the requests only read, so a dropped connection is safe to try again
+                if attempt < self.max_retries:
+                    await asyncio.sleep(get_backoff(attempt, self.base_backoff, self.max_backoff))
+                    continue
+                raise
+            if status == 200:
+                return data
+            code = data.get("__type", "").rpartition("#")[2]
+            if attempt < self.max_retries and (status >= 500 or code in RETRYABLE_ERRORS):
+                await asyncio.sleep(get_backoff(attempt, self.base_backoff, self.max_backoff))
+                continue
+            raise ClientError({
+                "Error": {"Code": code, "Message": data.get("message", data.get("Message", ""))},
+                "ResponseMetadata": {"HTTPStatusCode": status},
+            }, operation)
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._loop = self._session = None
+
+    async def _get_credentials(self):
+        if isinstance(self.credentials, RefreshableCredentials) and self.credentials.refresh_needed():
+            # refreshing reads files or calls STS and the metadata endpoint, which would block the loop
+            return await asyncio.get_event_loop().run_in_executor(None, self.credentials.get_frozen_credentials)
+        return self.credentials.get_frozen_credentials()
+
+    async def _request(self, operation, body):
+        request = AWSRequest(method="POST", url=self._url, data=body, headers={
+            "Content-Type": CONTENT_TYPE,
+            "X-Amz-Target": TARGET_PREFIX + operation,
+        })
+        SigV4Auth(await self._get_credentials(), "dynamodb", self.region).add_auth(request)
+
+        loop = asyncio.get_event_loop()
+        if loop is not self._loop:
+            self._loop, self._session = loop, aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_connections),
+                timeout=aiohttp.ClientTimeout(total=self.timeout))
+        async with self._session.post(self._url, data=body, headers=dict(request.headers.items())) as response:
+            content = await response.read()
+            return response.status, json.loads(content.decode("utf-8")) if content else {}
+
+
+def add_expression_attributes(params, names, values=None):
+    if names:
+        params["ExpressionAttributeNames"] = dict((placeholder, name) for name, placeholder in names.items())
+    if values:
+        params["ExpressionAttributeValues"] = values
+    return params
+
+
+async def get_item_async(client, model, key, attributes_to_get=None, consistent_read=False):
+    """cache.get_item on the async client, raises model.DoesNotExist for a missing item"""
+    ttl = get_cache_ttl(model)
+    if ttl:
+        # cached models are read whole
+        attributes_to_get = None
+        if not consistent_read:
+            item = get_cached_item(model, key)
+            if item is NOT_FOUND:
+                raise model.DoesNotExist()
+            if item is not None:
+                return item
+
+    names = {}
+    params = {"TableName": model.Meta.table_name, "Key": get_key_map(model, key)}
+    if attributes_to_get is not None:
+        params["ProjectionExpression"] = create_projection_expression(attributes_to_get, names)
+    if consistent_read:
+        params["ConsistentRead"] = True
+    data = await client.call("GetItem", add_expression_attributes(params, names))
+
+    item = model.from_raw_data(data["Item"]) if data.get("Item") else None
+    if ttl:
+        cache_item(model, key, item)
+    if item is None:
+        raise model.DoesNotExist()
+    return item
+
+
+async def batch_get_items_async(client, model, keys, attributes_to_get=None, consistent_read=None,
+                                chunk_size=BATCH_GET_PAGE_LIMIT, max_retries=8, base_backoff=0.05, max_backoff=2.0,
+                                identity_map=None):
+    """loaders.batch_get_items on the async client, the chunks are read concurrently on the event loop"""
+    items, wanted, attributes_to_get = get_known_items(model, keys, attributes_to_get, consistent_read, identity_map)
+    if not wanted:
+        return items
+
+    async def get_chunk(chunk):
+        raw_items = []
+        chunk = [get_typed_key(model, raw_key) for raw_key in chunk]
+        for attempt in range(max_retries + 1):
+            request = get_keys_and_attributes(chunk, attributes_to_get, consistent_read)
+            data = await client.call("BatchGetItem", {"RequestItems": {model.Meta.table_name: request}})
+            raw_items.extend(data.get("Responses", {}).get(model.Meta.table_name, []))
+            unprocessed = data.get("UnprocessedKeys", {}).get(model.Meta.table_name)
+            if not unprocessed:
+                return raw_items
+            chunk = unprocessed["Keys"]
+            if attempt < max_retries:
+                await asyncio.sleep(get_backoff(attempt, base_backoff, max_backoff))
+        raise GetError("%d keys of %s were still unprocessed after %d retries" % (
+            len(chunk), model.__name__, max_retries))
+
+    pages = await asyncio.gather(*[get_chunk(chunk) for chunk in get_key_chunks(wanted, chunk_size)])
+    return add_read_items(model, items, wanted, pages, attributes_to_get, identity_map)
+
+
+def get_read_params(plan, limit=None, last_evaluated_key=None, consistent_read=None, attributes_to_get=None,
+                    scan_index_forward=None, range_key_condition=None, **params):
+    """Query or Scan request of a QueryPlan, with the parameters pynamodb's query and scan take"""
+    if range_key_condition is None:
+        range_key_condition = plan.range_key_condition
+    model = plan.model
+    names, values = {}, {}
+    request = {"TableName": model.Meta.table_name}
+    if plan.operation in (QUERY, INDEX_QUERY):
+        hash_key_name = model._hash_keyname if plan.operation == QUERY else get_index_keys(plan.index)[0]
+        key_condition = getattr(model, hash_key_name) == plan.hash_key
+        if range_key_condition is not None:
+            key_condition &= range_key_condition
+        request["KeyConditionExpression"] = key_condition.serialize(names, values)
+        if plan.operation == INDEX_QUERY:
+            request["IndexName"] = plan.index.Meta.index_name
+        if scan_index_forward is not None:
+            request["ScanIndexForward"] = scan_index_forward
+    if plan.filter_condition is not None:
+        request["FilterExpression"] = plan.filter_condition.serialize(names, values)
+    if attributes_to_get is not None:
+        request["ProjectionExpression"] = create_projection_expression(attributes_to_get, names)
+    # global secondary indexes only support eventually consistent reads
+    if consistent_read and not isinstance(plan.index, GlobalSecondaryIndex):
+        request["ConsistentRead"] = True
+    if last_evaluated_key:
+        request["ExclusiveStartKey"] = last_evaluated_key
+    if limit:
+        request["Limit"] = limit
+    if "segment" in params:
+        request["Segment"], request["TotalSegments"] = params["segment"], params["total_segments"]
+    return add_expression_attributes(request, names, values)
+
+
+async def read_pages_async(client, plan, limit=None, last_evaluated_key=None, **params):
+    """Reads pages until limit items came back or the read reaches its end, like pynamodb's ResultIterator"""
+    operation = "Query" if plan.operation in (QUERY, INDEX_QUERY) else "Scan"
+    raw_items = []
+    while True:
+        data = await client.call(operation, get_read_params(
+            plan, limit=limit - len(raw_items) if limit else None, last_evaluated_key=last_evaluated_key, **params))
+        raw_items.extend(data.get("Items", []))
+        last_evaluated_key = data.get("LastEvaluatedKey")
+        if not last_evaluated_key or (limit and len(raw_items) >= limit):
+            return BatchGetResult([plan.model.from_raw_data(raw_item) for raw_item in raw_items], last_evaluated_key)
+
+
+async def read_query_plan_async(client, plan, identity_map=None, limit=None, last_evaluated_key=None, **params):
+    """Runs a QueryPlan on the async client, the result is read whole, with the last_evaluated_key of the read"""
+    if plan.operation == BATCH_GET:
+        keys = plan.get_batch_keys(limit, last_evaluated_key)
+        if not keys:
+            return BatchGetResult([])
+        items = await batch_get_items_async(
+            client, plan.model, keys, attributes_to_get=params.get("attributes_to_get"),
+            consistent_read=params.get("consistent_read"), identity_map=identity_map,
+        )
+        return plan.get_batch_result(keys, items)
+
+    if plan.operation == SCAN and plan.total_segments and plan.total_segments > 1:
+        starts, segment_limit = plan.get_segment_starts(limit, last_evaluated_key)
+
+        async def scan_segment(segment):
+            if starts[segment] is EXHAUSTED:
+                return [], EXHAUSTED
+            result = await read_pages_async(
+                client, plan, limit=segment_limit, last_evaluated_key=starts[segment], segment=segment,
+                total_segments=plan.total_segments, **params
+            )
+            return list(result), result.last_evaluated_key or EXHAUSTED
+
+        pages = await asyncio.gather(*[scan_segment(segment) for segment in range(plan.total_segments)])
+        return ParallelScanResult(plan.model, starts, pages, limit)
+
+    return await read_pages_async(client, plan, limit=limit, last_evaluated_key=last_evaluated_key, **params)
+
+
+class AsyncModelLoader(object):
+    """Loads items of a model on the async client, the keys requested in the same loop iteration share one batch_get"""
+
+    def __init__(self, client, model, attributes_to_get=None, consistent_read=False, identity_map=None):
+        self.client = client
+        self.model = model
+        self.attributes_to_get = attributes_to_get
+        self.consistent_read = consistent_read
+        self.identity_map = identity_map
+        self._pending = OrderedDict()
+
+    def load(self, key):
+        """Returns a future of the item of key, None when it does not exist"""
+        loop = asyncio.get_event_loop()
+        future = loop.create_future()
+        if not self._pending:
+            loop.call_soon(self._dispatch)
+        self._pending.setdefault(key, []).append(future)
+        return future
+
+    def _dispatch(self):
+        pending, self._pending = self._pending, OrderedDict()
+        asyncio.ensure_future(self._load(pending))
+
+    async def _load(self, pending):
+        try:
+            items = await batch_get_items_async(
+                self.client, self.model, list(pending), attributes_to_get=self.attributes_to_get,
+                consistent_read=self.consistent_read or None, identity_map=self.identity_map,
+            )
+        except Exception as e:
+            for futures in pending.values():
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+            return
+        for key, futures in pending.items():
+            for future in futures:
+                if not future.done():
+                    future.set_result(items.get(key))
+
+
+def get_async_loader(info, client, model, attributes_to_get=None, consistent_read=False):
+    """Returns the async loader of the current request for model.
+
+    Unlike loaders.get_batch_loader, the async loaders batch the keys of one model and projection: their reads do
+    not share BatchGetItem calls across tables.
+    """
+    loaders = get_request_store(info, LOADERS_KEY)
+    loader_key = model, tuple(attributes_to_get) if attributes_to_get is not None else None, bool(consistent_read)
+    if loader_key not in loaders:
+        loaders[loader_key] = AsyncModelLoader(
+            client, model, attributes_to_get=attributes_to_get, consistent_read=consistent_read,
+            identity_map=get_identity_map(info),
+        )
+    return loaders[loader_key]
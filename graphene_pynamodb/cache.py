@@ -0,0 +1,282 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from graphene_pynamodb.utils import get_raw_key, get_request_store, serialize_key
+
+# name of the identity map of a request in its context
+IDENTITY_MAP_KEY = "pynamodb_identity_map"
+
+# returned by get_cached_item for keys cached as missing
+NOT_FOUND = object()
+
+_item_cache = None
+
+
+def get_item_key(model, key):
+    """(model, hash key, range key) of a hash key or a (hash, range) tuple"""
+    if isinstance(key, tuple):
+        return (model,) + key
+    return model, key, None
+
+
+class IdentityMap(object):
+    """Items read during one request by (model, hash key, range key), along with the attributes they were read with.
+
+    An item read with a projection only serves the reads that need a subset of its attributes.
+    """
+
+    def __init__(self):
+        self._items = {}
+
+    def __len__(self):
+        return len(self._items)
+
+    def get(self, model, key, attributes_to_get=None):
+        entry = self._items.get(get_item_key(model, key))
+        if entry is None:
+            return None
+        item, attributes = entry
+        if attributes is None or (attributes_to_get is not None and attributes >= set(attributes_to_get)):
+            return item
+        return None
+
+    def add(self, item, attributes_to_get=None):
+        model = type(item)
+        key = getattr(item, model._hash_keyname)
+        if model._range_keyname:
+            key = key, getattr(item, model._range_keyname)
+        item_key = get_item_key(model, key)
+        attributes = None if attributes_to_get is None else frozenset(attributes_to_get)
+
+        current = self._items.get(item_key)
+        # keep the item read with the most attributes
+        if current is None or attributes is None or (current[1] is not None and attributes >= current[1]):
+            self._items[item_key] = item, attributes
+        elif current[1] is not None and not current[1] >= attributes:
+            # neither projection holds the other, the item held gains the attributes just read
+            merged, held = current
+            for name in attributes - held:
+                name = model._dynamo_to_python_attr(name)
+                if name in item.attribute_values:
+                    merged.attribute_values[name] = item.attribute_values[name]
+                else:
+                    merged.attribute_values.pop(name, None)
+            self._items[item_key] = merged, held | attributes
+        return self._items[item_key][0]
+
+
+def get_identity_map(info):
+    """Returns the identity map of the current request, None when the request has no context to hold it"""
+    return get_request_store(info, IDENTITY_MAP_KEY, IdentityMap)
+
+
+class LRUCache(object):
+    """In-process item cache backend, evicts the least recently used entries past max_size.
+
+    Backends map string keys to the raw data of an item, an empty dict standing for a missing item. They implement
+    get(key), returning None on a miss, set(key, value, ttl), delete(key) and clear().
+    """
+
+    def __init__(self, max_size=10000):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = value, time.monotonic() + ttl
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def set_item_cache(backend):
+    """Sets the process wide item cache, None turns it off"""
+    global _item_cache
+    _item_cache = backend
+
+
+def get_item_cache():
+    return _item_cache
+
+
+def get_cache_ttl(model):
+    """Seconds the items of model stay cached, from its Meta.cache_ttl. Models without one are not cached."""
+    if _item_cache is None:
+        return None
+    return getattr(model.Meta, "cache_ttl", None)
+
+
+def get_cache_key(model, key):
+    return json.dumps([model.Meta.table_name] + list(get_raw_key(model, serialize_key(model, key))))
+
+
+def get_cached_item(model, key):
+    """Returns the cached item, NOT_FOUND for a key cached as missing or None on a miss"""
+    if not get_cache_ttl(model):
+        return None
+    data = _item_cache.get(get_cache_key(model, key))
+    if data is None:
+        return None
+    if not data:
+        return NOT_FOUND
+    return model.from_raw_data(data)
+
+
+def cache_item(model, key, item):
+    """Caches a whole item, or a missing one when item is None, for Meta.cache_negative_ttl (default cache_ttl)"""
+    ttl = get_cache_ttl(model)
+    if not ttl:
+        return
+    if item is None:
+        ttl = getattr(model.Meta, "cache_negative_ttl", ttl)
+    _item_cache.set(get_cache_key(model, key), item.serialize(null_check=False) if item is not None else {}, ttl)
+
+
+def invalidate_item(item):
+    """Drops an item from the item cache, call it after writing the item"""
+    if _item_cache is None:
+        return
+    model = item.__class__
+    key = getattr(item, model._hash_keyname)
+    if model._range_keyname:
+        key = key, getattr(item, model._range_keyname)
+    _item_cache.delete(get_cache_key(model, key))
+
+
+class SingleFlight(object):
+    """Runs concurrent calls with the same key once, the callers that join a call in flight share its outcome.
+
+    coalesced counts the calls that did not run.
+    """
+
+    def __init__(self):
+        self.coalesced = 0
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        """Returns the result of fn, and whether it came from the call of another thread"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = {"done": threading.Event()}
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call["done"].wait()
+            if "error" in call:
+                raise call["error"]
+            return call["result"], True
+
+        try:
+            call["result"] = fn()
+        except BaseException as e:
+            call["error"] = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call["done"].set()
+        return call["result"], False
+
+
+single_flight = SingleFlight()
+
+
+def get_coalesced_reads():
+    """Number of reads served by an identical read already in flight"""
+    return single_flight.coalesced
+
+
+def _get(model, hash_key, range_key, **kwargs):
+    """Model.get, sharing the reads in flight for the same key, projection and consistency"""
+    attributes_to_get = kwargs.get("attributes_to_get")
+    flight_key = (
+        model, hash_key, range_key, tuple(sorted(attributes_to_get)) if attributes_to_get is not None else None,
+        bool(kwargs.get("consistent_read")),
+    )
+    args = (hash_key, range_key) if range_key is not None else (hash_key,)
+    item, shared = single_flight.do(flight_key, lambda: model.get(*args, **kwargs))
+    # every caller gets its own instance
+    return item.from_raw_data(item.serialize(null_check=False)) if shared else item
+
+
+def get_item(model, key, attributes_to_get=None, consistent_read=False):
+    """Model.get through the item cache, concurrent identical reads share one call.
+
+    Cached models are read whole so that the cached copy serves any selection. Consistent reads skip the cached
+    copy but refresh it.
+    """
+    hash_key, range_key = key if isinstance(key, tuple) else (key, None)
+    ttl = get_cache_ttl(model)
+    kwargs = {}
+    if consistent_read:
+        kwargs["consistent_read"] = True
+    if not ttl:
+        if attributes_to_get is not None:
+            kwargs["attributes_to_get"] = attributes_to_get
+        return _get(model, hash_key, range_key, **kwargs)
+
+    if not consistent_read:
+        item = get_cached_item(model, key)
+        if item is NOT_FOUND:
+            raise model.DoesNotExist()
+        if item is not None:
+            return item
+    try:
+        item = _get(model, hash_key, range_key, **kwargs)
+    except model.DoesNotExist:
+        cache_item(model, key, None)
+        raise
+    cache_item(model, key, item)
+    return item
+
+
+class CacheInvalidationMixin(object):
+    """Model mixin dropping the cached copy of an item whenever it is saved, updated or deleted"""
+
+    def save(self, *args, **kwargs):
+        try:
+            return super(CacheInvalidationMixin, self).save(*args, **kwargs)
+        finally:
+            invalidate_item(self)
+
+    def update(self, *args, **kwargs):
+        try:
+            return super(CacheInvalidationMixin, self).update(*args, **kwargs)
+        finally:
+            invalidate_item(self)
+
+    def delete(self, *args, **kwargs):
+        try:
+            return super(CacheInvalidationMixin, self).delete(*args, **kwargs)
+        finally:
+            invalidate_item(self)
@@ -0,0 +1,71 @@
+import threading
+import time
+
+from graphene_pynamodb.utils import get_context_value
+
+# name of the consistent read policy in the request context
+CONTEXT_KEY = "consistent_read"
+
+
+def get_consistent_read(object_type, info, field_policy=None, key=None):
+    """Decides whether a read for object_type should be strongly consistent.
+
+    The policies of the request context, the field and the type's Meta are asked in that order. A policy is
+    either a boolean or a callable ``policy(model, info, key)`` where key is None for list reads; a callable
+    returning None leaves the decision to the next policy. Reads are eventually consistent by default.
+    """
+    policies = (
+        get_context_value(info, CONTEXT_KEY),
+        field_policy,
+        getattr(object_type._meta, "consistent_read", None),
+    )
+    for policy in policies:
+        if policy is None:
+            continue
+        if callable(policy):
+            policy = policy(object_type._meta.model, info, key)
+            if policy is None:
+                continue
+        return bool(policy)
+    return False
+
+
+class RecentWritesPolicy(object):
+    """Read-your-writes policy: items recorded as written in the last ``window`` seconds are read
+    strongly consistent, and so are list reads of their model.
+
+    Call ``record(item)`` from the mutations and save paths, usually with one policy per session.
+    """
+
+    def __init__(self, window=1.0, max_entries=1024):
+        self.window = window
+        self.max_entries = max_entries
+        self._items = {}
+        self._models = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def get_key(model, key):
+        return key if isinstance(key, tuple) else (key, None)
+
+    def record(self, item):
+        model = type(item)
+        key = getattr(item, model._hash_keyname), getattr(item, model._range_keyname) if model._range_keyname else None
+        now = time.monotonic()
+        with self._lock:
+            if len(self._items) >= self.max_entries:
+                self._items = dict(
+                    (written, at) for written, at in self._items.items() if now - at < self.window
+                )
+            self._items[(model, key)] = now
+            self._models[model] = now
+
+    def __call__(self, model, info, key=None):
+        with self._lock:
+            if key is None:
+                written_at = self._models.get(model)
+            else:
+                written_at = self._items.get((model, self.get_key(model, key)))
+        if written_at is not None and time.monotonic() - written_at < self.window:
+            return True
+        return None
@@ -11,9 +11,14 @@ from graphene.types import ObjectType
 from graphene.types.json import JSONString
 from graphene.types.resolver import default_resolver
 from graphene_pynamodb import relationships
+from graphene_pynamodb.aio import get_async_client, get_async_loader
+from graphene_pynamodb.cache import get_identity_map
+from graphene_pynamodb.consistency import get_consistent_read
 from graphene_pynamodb.fields import PynamoConnectionField
+from graphene_pynamodb.loaders import get_batch_loader, is_breadth_first, load_item, load_items
 from graphene_pynamodb.registry import Registry
-from graphene_pynamodb.relationships import OneToMany, OneToOne
+from graphene_pynamodb.relationships import OneToMany, OneToOne, RelationshipResult, RelationshipResultList
+from graphene_pynamodb.utils import get_attributes_to_get
 
 
 @singledispatch
@@ -44,6 +49,57 @@ def convert_date_to_string(type, attribute, registry=None):
     )
 
 
+def one_to_one_resolver(attribute, _type):
+    """Resolves a OneToOne through the request's loader, so the items of sibling fields load in one BatchGetItem
+    whatever their models"""
+
+    def _resolver(parent, info, **kwargs):
+        value = getattr(parent, parent._dynamo_to_python_attr(attribute.attr_name), None)
+        # loaded already, or not lazy
+        if not isinstance(value, RelationshipResult) or not isinstance(value.__wrapped__, type):
+            return value
+
+        attributes_to_get = get_attributes_to_get(_type, info)
+        consistent_read = get_consistent_read(_type, info, key=value._self_key)
+        client = get_async_client(info)
+        if client is not None:
+            return get_async_loader(info, client, value._self_model, attributes_to_get, consistent_read).load(
+                value._self_key)
+        if get_batch_loader(info) is None:
+            return value
+        return load_item(info, value._self_model, value._self_key, attributes_to_get, consistent_read)
+
+    return _resolver
+
+
+def one_to_many_resolver(attribute, _type):
+    """Resolves a OneToMany listed without a connection, in one batch_get on the asyncio path and with the lists of
+    the same depth in breadth first mode"""
+
+    def _resolver(parent, info, **kwargs):
+        value = getattr(parent, parent._dynamo_to_python_attr(attribute.attr_name), None)
+        if not isinstance(value, RelationshipResultList):
+            return value
+        client = get_async_client(info)
+        if client is None:
+            if not is_breadth_first(info):
+                return value
+            return load_items(
+                info, value._model, value._keys, get_attributes_to_get(_type, info), get_consistent_read(_type, info)
+            ).then(lambda items: [item for item in value.set_items(value._keys, items) if item is not None])
+
+        async def resolve():
+            items = await value.load_async(
+                client, attributes_to_get=get_attributes_to_get(_type, info),
+                consistent_read=get_consistent_read(_type, info), identity_map=get_identity_map(info),
+            )
+            return [item for item in items if item is not None]
+
+        return resolve()
+
+    return _resolver
+
+
 @convert_pynamo_attribute.register(relationships.Relationship)
 def convert_relationship_to_dynamic(type, attribute, registry=None):
     def dynamic_type():
@@ -52,12 +108,12 @@ def convert_relationship_to_dynamic(type, attribute, registry=None):
             return None
 
         if isinstance(attribute, OneToOne):
-            return Field(_type)
+            return Field(_type, resolver=one_to_one_resolver(attribute, _type))
 
         if isinstance(attribute, OneToMany):
             if _type._meta.connection:
-                return PynamoConnectionField(_type)
-            return Field(List(_type))
+                return PynamoConnectionField(_type, query_arguments=False)
+            return Field(List(_type), resolver=one_to_many_resolver(attribute, _type))
 
     return Dynamic(dynamic_type)
 
@@ -0,0 +1,154 @@
+"""Count strategies for the totalCount of root connections.
+
+A strategy is a callable ``strategy(query, info)`` given the QueryPlan of the connection, it returns the number of
+items the whole read would return, or None to leave totalCount to the items of the page. Strategies only run when
+the query selects totalCount:
+
+    users = PynamoConnectionField(UserNode, count_strategy=TableItemCount(fallback=ScanCount()))
+
+Relationship connections need no strategy, their totalCount is the length of their list of keys.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from pynamodb.exceptions import DoesNotExist
+from pynamodb.indexes import GlobalSecondaryIndex
+
+from graphene_pynamodb.loaders import batch_get_items
+from graphene_pynamodb.planner import BATCH_GET, INDEX_QUERY, QUERY, SCAN, QueryPlan
+
+
+def reads_table(query):
+    """Whether a query plan reads every item of its table, with no key or filter condition"""
+    return isinstance(query, QueryPlan) and query.operation == SCAN and query.filter_condition is None
+
+
+def scan_count(model, filter_condition=None, consistent_read=False, total_segments=None):
+    """Counts the items of a scan with Select=COUNT, no item is sent back. Segments are counted concurrently."""
+    discriminator = model._get_discriminator_attribute()
+    if discriminator:
+        # a scan of a model class only returns the instances of that class
+        condition = discriminator.is_in(*discriminator.get_registered_subclasses(model))
+        filter_condition = condition if filter_condition is None else filter_condition & condition
+
+    params = {"TableName": model.Meta.table_name, "Select": "COUNT"}
+    if filter_condition is not None:
+        names, values = {}, {}
+        params["FilterExpression"] = filter_condition.serialize(names, values)
+        params["ExpressionAttributeNames"] = dict((placeholder, name) for name, placeholder in names.items())
+        if values:
+            params["ExpressionAttributeValues"] = values
+    if consistent_read:
+        params["ConsistentRead"] = True
+    connection = model._get_connection().connection
+
+    def count_segment(segment):
+        segment_params = dict(params)
+        if segment is not None:
+            segment_params.update(Segment=segment, TotalSegments=total_segments)
+        count = 0
+        while True:
+            data = connection.dispatch("Scan", segment_params)
+            count += data["Count"]
+            if not data.get("LastEvaluatedKey"):
+                return count
+            segment_params["ExclusiveStartKey"] = data["LastEvaluatedKey"]
+
+    if not total_segments or total_segments < 2:
+        return count_segment(None)
+    with ThreadPoolExecutor(max_workers=total_segments) as pool:
+        return sum(pool.map(count_segment, range(total_segments)))
+
+
+class ScanCount(object):
+    """Exact counts: Select=COUNT queries and scans with the conditions of the read, batch gets of the keys only.
+
+    They read every item they count, and cost the read capacity of reading them.
+    """
+
+    def __init__(self, consistent_read=False):
+        self.consistent_read = consistent_read
+
+    def __call__(self, query, info):
+        if not isinstance(query, QueryPlan):
+            return None
+        model = query.model
+
+        if query.operation == BATCH_GET:
+            hash_key_name = model._hash_key_attribute().attr_name
+            return len(batch_get_items(
+                model, query.keys, attributes_to_get=[hash_key_name], consistent_read=self.consistent_read))
+
+        if query.operation in (QUERY, INDEX_QUERY):
+            index = query.index if query.operation == INDEX_QUERY else None
+            return model.count(
+                query.hash_key,
+                range_key_condition=query.range_key_condition,
+                filter_condition=query.filter_condition,
+                index_name=index.Meta.index_name if index else None,
+                # global secondary indexes only support eventually consistent reads
+                consistent_read=self.consistent_read and not isinstance(index, GlobalSecondaryIndex),
+            )
+
+        return scan_count(model, query.filter_condition, self.consistent_read, query.total_segments)
+
+
+class TableItemCount(object):
+    """Estimates from the ItemCount of DescribeTable, which DynamoDB refreshes about every six hours.
+
+    The estimate counts whole tables, reads with key or filter conditions go to the fallback strategy. Counts are
+    kept ttl seconds per model, DescribeTable is rate limited.
+    """
+
+    def __init__(self, fallback=None, ttl=300.0):
+        self.fallback = fallback
+        self.ttl = ttl
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, query, info):
+        if not reads_table(query) or query.model._get_discriminator_attribute():
+            return self.fallback(query, info) if self.fallback else None
+
+        model = query.model
+        now = time.monotonic()
+        with self._lock:
+            count, read_at = self._counts.get(model, (None, None))
+        if count is None or now - read_at >= self.ttl:
+            count = model.describe_table().get("ItemCount")
+            with self._lock:
+                self._counts[model] = count, now
+        return count
+
+
+class MaintainedCount(object):
+    """Counts kept in a counter table by the write paths of the application, read with one GetItem.
+
+    counter_model has a string hash key and a NumberAttribute named count_attribute. The counter of a read is the
+    item get_key(query) returns, the name of the model for whole table reads by default; reads without a counter
+    go to the fallback strategy. Call ``increment(model)`` and ``increment(model, -1)`` where items are created
+    and deleted.
+    """
+
+    def __init__(self, counter_model, count_attribute="count", get_key=None, fallback=None):
+        self.counter_model = counter_model
+        self.count_attribute = count_attribute
+        self.get_key = get_key or (lambda query: query.model.__name__ if reads_table(query) else None)
+        self.fallback = fallback
+
+    def __call__(self, query, info):
+        key = self.get_key(query) if isinstance(query, QueryPlan) else None
+        if key is None:
+            return self.fallback(query, info) if self.fallback else None
+        attribute = getattr(self.counter_model, self.count_attribute)
+        try:
+            counter = self.counter_model.get(key, attributes_to_get=[attribute.attr_name])
+        except DoesNotExist:
+            return 0
+        return int(getattr(counter, self.count_attribute) or 0)
+
+    def increment(self, model, by=1):
+        """Adds by to the counter of the whole table of model, creating the counter on first use"""
+        attribute = getattr(self.counter_model, self.count_attribute)
+        self.counter_model(model.__name__).update(actions=[attribute.add(by)])
@@ -0,0 +1,121 @@
+"""Thread pool executor for graphql-core resolving the independent DynamoDB reads of a query concurrently.
+
+Root fields, lists and connections run on the pool, so a query asking for five unrelated connections waits for the
+slowest read rather than for the five of them. The batch_get of the request loaders runs on the pool too. Use one
+executor per request over a pool shared by the process, and size the botocore connection pool of the models to it:
+
+    pool = ThreadPoolExecutor(max_workers=16)
+    share_connection_pool([User, Role], max_connections=16)
+    schema.execute(query, executor=PynamoThreadExecutor(pool), context_value={})
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import botocore.client
+from graphene.relay import Connection
+from graphql.execution.executors.utils import process
+from graphql.type import GraphQLList, GraphQLNonNull
+from promise import Promise
+
+from graphene_pynamodb.utils import get_context_value, get_request_store, is_valid_pynamo_model
+
+# name of the executor of a request in its context, the loaders submit their reads to it
+CONTEXT_KEY = "pynamodb_executor"
+
+
+def get_executor(info):
+    """The PynamoThreadExecutor running the current request, None under other executors"""
+    return get_context_value(info, CONTEXT_KEY)
+
+
+def reads_items(info):
+    """Whether the field resolves to a list or a connection of the types of a PynamoDB model"""
+    return_type = info.return_type
+    if isinstance(return_type, GraphQLNonNull):
+        return_type = return_type.of_type
+    is_list = isinstance(return_type, GraphQLList)
+    while isinstance(return_type, (GraphQLList, GraphQLNonNull)):
+        return_type = return_type.of_type
+
+    graphene_type = getattr(return_type, "graphene_type", None)
+    if isinstance(graphene_type, type) and issubclass(graphene_type, Connection):
+        graphene_type = graphene_type._meta.node
+    elif not is_list:
+        return False
+    return bool(is_valid_pynamo_model(getattr(getattr(graphene_type, "_meta", None), "model", None)))
+
+
+class PynamoThreadExecutor(object):
+    """graphql-core executor running the root fields of queries, and the lists and connections of PynamoObjectTypes,
+    on a thread pool.
+
+    Other fields resolve inline, on the thread that completed their parent: they read items already loaded or go
+    through a request loader, whose batch_get the loader submits to the pool.
+    """
+
+    def __init__(self, pool=None, max_workers=16):
+        self.pool = pool or ThreadPoolExecutor(max_workers=max_workers)
+        self.futures = []
+        self._lock = threading.Lock()
+        # (parent type, field name) -> whether the field runs on the pool
+        self._fields = {}
+
+    def wait_until_finished(self):
+        while True:
+            with self._lock:
+                futures, self.futures = self.futures, []
+            if not futures:
+                return
+            wait(futures)
+
+    def clean(self):
+        with self._lock:
+            self.futures = []
+
+    def submit(self, fn, *args, **kwargs):
+        """Runs fn on the pool, returns a Promise of its result"""
+        promise = Promise()
+        future = self.pool.submit(process, promise, fn, args, kwargs)
+        with self._lock:
+            self.futures.append(future)
+        return promise
+
+    def runs_on_pool(self, info):
+        field = info.parent_type.name, info.field_name
+        if field not in self._fields:
+            self._fields[field] = info.parent_type is info.schema.get_query_type() or reads_items(info)
+        return self._fields[field]
+
+    def execute(self, fn, *args, **kwargs):
+        info = args[1]
+        # the loaders of the request find the executor in its context
+        get_request_store(info, CONTEXT_KEY, lambda: self)
+        if not self.runs_on_pool(info):
+            return fn(*args, **kwargs)
+        return self.submit(fn, *args, **kwargs)
+
+
+def share_connection_pool(models, max_connections=16):
+    """Makes models share one botocore client per region and host, with max_connections pooled HTTP connections.
+
+    Size max_connections to the threads reading DynamoDB, like the max_workers of the executor pool, so that no
+    thread waits for a connection and none are opened only to be thrown away.
+    """
+    clients = {}
+    for model in models:
+        model.Meta.max_pool_connections = max_connections
+        # the connection is rebuilt with the new pool size
+        model._connection = None
+        connection = model._get_connection().connection
+        endpoint = model.Meta.region, model.Meta.host
+        if endpoint not in clients:
+            clients[endpoint] = connection.session.create_client(
+                "dynamodb", model.Meta.region, endpoint_url=model.Meta.host, config=botocore.client.Config(
+                    parameter_validation=False,
+                    connect_timeout=model.Meta.connect_timeout_seconds,
+                    read_timeout=model.Meta.read_timeout_seconds,
+                    max_pool_connections=max_connections,
+                ),
+            )
+        connection._client = clients[endpoint]
+    return clients
@@ -1,19 +1,56 @@
 from __future__ import absolute_import
 
+import asyncio
+from collections import OrderedDict, deque
+from collections.abc import Sized
 from functools import partial
+from inspect import isawaitable
+from itertools import islice
 
+from graphql_relay import from_global_id
 from graphql_relay.connection.connectiontypes import Edge
 
-from graphene import Int, relay
+from graphene import ID, Field, Int, List, NonNull, relay
 from graphene.relay.connection import PageInfo
-from graphene_pynamodb.relationships import RelationshipResultList
-from graphene_pynamodb.utils import from_cursor, get_key_name, to_cursor
+from graphene_pynamodb.aio import batch_get_items_async, get_async_client, read_query_plan_async
+from graphene_pynamodb.cache import get_identity_map
+from graphene_pynamodb.consistency import get_consistent_read
+from graphene_pynamodb.keys import get_key_codec
+from graphene_pynamodb.loaders import batch_get_keys, is_breadth_first, load_items
+from graphene_pynamodb.planner import QueryPlan, get_filter_type, get_key_arguments, plan_query
+from graphene_pynamodb.relationships import RelationshipResult, RelationshipResultList
+from graphene_pynamodb.utils import (from_cursor, get_attributes_to_get, get_selected_fields, is_valid_pynamo_model,
+                                     key_to_cursor, selects_cursors, selects_keys_only, to_cursor)
+
+
+def get_page_keys(iterable, first=None, last=None, after=None):
+    """The keys of a RelationshipResultList the page of a connection holds"""
+    keys = iterable._keys
+    if after:
+        start = iterable.position_after(from_cursor(after, iterable._model)[1])
+        keys = keys[start:] if start is not None else []
+    keys = keys[-last:] if last else keys
+    return keys[:first or last] if first or last else keys
 
 
 class PynamoConnectionField(relay.ConnectionField):
     total_count = Int()
 
     def __init__(self, type, *args, **kwargs):
+        # opt-in parallel scans, read with one thread per segment
+        self.total_segments = kwargs.pop("total_segments", None)
+        # a boolean or a policy callable, see graphene_pynamodb.consistency
+        self.consistent_read = kwargs.pop("consistent_read", None)
+        # totalCount of root reads, see graphene_pynamodb.counting
+        self.count_strategy = kwargs.pop("count_strategy", None)
+        # key and filter arguments only make sense on root connections, relationships pass query_arguments=False
+        if kwargs.pop("query_arguments", True):
+            for name, argument in get_key_arguments(type._meta.model).items():
+                kwargs.setdefault(name, argument)
+            filter_type = get_filter_type(type)
+            if filter_type is not None:
+                kwargs.setdefault("filter", filter_type())
+
         super(PynamoConnectionField, self).__init__(
             type._meta.connection, *args, **kwargs
         )
@@ -22,70 +59,201 @@ class PynamoConnectionField(relay.ConnectionField):
     def model(self):
         return self.type._meta.node._meta.model
 
-    @classmethod
-    def get_query(cls, model, info, **args):
-        return model.scan
+    def get_query(self, model, info, **args):
+        return plan_query(model, args, total_segments=self.total_segments)
+
+    def counts(self, info):
+        """Whether the field has a count strategy and the query selects totalCount"""
+        return self.count_strategy is not None and "totalCount" in get_selected_fields(info)
+
+    def count(self, query, info):
+        """totalCount of a root read from the count_strategy of the field, None when the query does not select it"""
+        if not self.counts(info):
+            return None
+        return self.count_strategy(query, info)
+
+    def get_query_params(self, model, info, attributes_to_get=None, consistent_read=None, **args):
+        """The plan of a root connection read and its parameters"""
+        query = self.get_query(model, info, **args)
+
+        first = args.get("first")
+        last = args.get("last")
+        after = from_cursor(args["after"], model)[1] if args.get("after") else None
+        before = from_cursor(args["before"], model)[1] if args.get("before") else None
+        # has_next comes from the last_evaluated_key of the read, no item past the page is fetched
+        query_params = dict(limit=first or last or 20, consistent_read=consistent_read)
+        backward = bool(last or before) and not first and getattr(query, "is_ordered", False)
+        if backward and after:
+            # the page read backwards stops at after, reads that can not take that bound page forwards from it
+            range_key_condition = query.get_range_key_bound(after)
+            if range_key_condition is None:
+                backward = False
+            else:
+                query_params["range_key_condition"] = range_key_condition
+        if backward:
+            # read the page in reverse key order starting right before the cursor
+            query_params["scan_index_forward"] = False
+            if before:
+                query_params["last_evaluated_key"] = before
+        elif after:
+            query_params["last_evaluated_key"] = after
+        if attributes_to_get is not None:
+            query_params["attributes_to_get"] = attributes_to_get
+
+        if isinstance(query, QueryPlan):
+            query_params["identity_map"] = get_identity_map(info)
+        return query, query_params
 
     # noinspection PyMethodOverriding
-    @classmethod
-    def connection_resolver(cls, resolver, connection, model, root, info, **args):
+    def connection_resolver(self, resolver, connection, model, root, info, **args):
         iterable = resolver(root, info, **args)
+        attributes_to_get = get_attributes_to_get(connection._meta.node, info)
+        consistent_read = get_consistent_read(connection._meta.node, info, self.consistent_read)
+
+        client = get_async_client(info)
+        if client is not None:
+            return self.connection_resolver_async(
+                client, iterable, connection, model, root, info, attributes_to_get, consistent_read, **args)
+
+        read = None
+        reads_page = isinstance(iterable, RelationshipResultList) and self.reads_items(connection, info)
+        if reads_page and is_breadth_first(info):
+            # the pages of every relationship at this depth are read together, in one BatchGetItem per level
+            keys = get_page_keys(iterable, args.get("first"), args.get("last"), args.get("after"))
+
+            def build(items):
+                iterable.set_items(keys, items)
+                return self.build_connection(connection, model, info, iterable, read, attributes_to_get,
+                                             consistent_read, **args)
+
+            return load_items(info, model, keys, attributes_to_get, consistent_read).then(build)
+
+        # get a full scan query since we have no resolved iterable from relationship or resolver function
+        total_count = None
+        if not iterable and not root:
+            query, query_params = self.get_query_params(model, info, attributes_to_get, consistent_read, **args)
+            # the pynamodb ResultIterator is consumed lazily while the edges are built
+            read = query, query_params, query(**query_params)
+            total_count = self.count(query, info)
+        return self.build_connection(connection, model, info, iterable, read, attributes_to_get, consistent_read,
+                                     total_count, **args)
+
+    async def connection_resolver_async(self, client, iterable, connection, model, root, info, attributes_to_get,
+                                        consistent_read, **args):
+        """connection_resolver on an AsyncDynamoClient, the items of the page are read before the edges are built"""
+        if isawaitable(iterable):
+            iterable = await iterable
+
+        read = total_count = None
+        if not iterable and not root:
+            query, query_params = self.get_query_params(model, info, attributes_to_get, consistent_read, **args)
+            # custom queries from get_query run as they are
+            result = await read_query_plan_async(client, query, **query_params) if isinstance(
+                query, QueryPlan) else query(**query_params)
+            read = query, query_params, result
+            if self.counts(info):
+                # count strategies read with pynamodb, off the event loop
+                total_count = await asyncio.get_event_loop().run_in_executor(None, self.count_strategy, query, info)
+        elif isinstance(iterable, RelationshipResultList) and self.reads_items(connection, info):
+            keys = get_page_keys(iterable, args.get("first"), args.get("last"), args.get("after"))
+            await iterable.load_async(
+                client, keys, attributes_to_get=attributes_to_get, consistent_read=consistent_read,
+                identity_map=get_identity_map(info),
+            )
+        return self.build_connection(connection, model, info, iterable, read, attributes_to_get, consistent_read,
+                                     total_count, **args)
+
+    @staticmethod
+    def reads_items(connection, info):
+        """Whether the edges of a relationship connection need their items, rather than only their keys"""
+        return not selects_keys_only(connection._meta.node, info)
+
+    def build_connection(self, connection, model, info, iterable, read=None, attributes_to_get=None,
+                         consistent_read=None, total_count=None, **args):
+        """Builds the connection from the iterable of a resolver or the (query, params, result) of a root read,
+        total_count is the count of the root read, when its field has a count strategy"""
+        result_iterator = None
+        backward = False
+        cursor_for = to_cursor
 
         first = args.get("first")
         last = args.get("last")
         (_, after) = (
-            from_cursor(args.get("after")) if args.get("after") else (None, None)
+            from_cursor(args.get("after"), model) if args.get("after") else (None, None)
         )
         (_, before) = (
-            from_cursor(args.get("before")) if args.get("before") else (None, None)
+            from_cursor(args.get("before"), model) if args.get("before") else (None, None)
         )
         has_previous_page = bool(after)
         page_size = first if first else last if last else None
 
-        # get a full scan query since we have no resolved iterable from relationship or resolver function
-        if not iterable and not root:
-            query = cls.get_query(model, info, **args)
-
-            query_params = dict(limit=page_size or 20, consistent_read=True)
-            if after:
-                query_params["last_evaluated_key"] = after
-
-            result_iterator = query(**query_params)
-            iterable = list(result_iterator)
+        if read is not None:
+            query, query_params, result_iterator = read
+            page_size = query_params["limit"]
+            backward = query_params.get("scan_index_forward") is False
+            iterable = result_iterator
+            # parallel scans track their segments, index queries need the index keys in their cursors
+            cursor_for = getattr(result_iterator, "cursor_for", None) or getattr(query, "cursor_for", to_cursor)
+            if backward:
+                iterable = list(result_iterator)
+                iterable.reverse()
             # if first or last or after or before:
             #     raise NotImplementedError(
             #         "DynamoDB scan operations have no predictable sort. Arguments first, last, after "
             #         + "and before will have unpredictable results"
             #     )
 
-        iterable = (
-            iterable
-            if isinstance(iterable, list)
-            else list(iterable)
-            if iterable
-            else []
-        )
+        # most clients only select nodes, cursors are encoded for those that ask for them
+        with_cursors = selects_cursors(info)
+        if not with_cursors:
+            cursor_for = None
+
+        iterable = iterable or []
+        if isinstance(iterable, RelationshipResultList):
+            # the whole relationship, counted from its keys rather than from the items of a page
+            total_count = len(iterable._keys)
+        if after and isinstance(iterable, RelationshipResultList):
+            # root reads resume from the cursor, relationships find it without a scan
+            iterable = self.get_iterable_after(iterable, model, after)
         if last:
-            iterable = iterable[-last:]
+            iterable = iterable[-last:] if isinstance(iterable, list) else list(deque(iterable, maxlen=last))
+        if total_count is None and isinstance(iterable, Sized):
+            total_count = len(iterable)
 
-        (has_next, edges) = cls.get_edges_from_iterable(
+        (has_next, edges) = self.get_edges_from_iterable(
             iterable,
             model,
             info,
             edge_type=connection.Edge,
             # after=after,
             page_size=page_size,
+            cursor_for=cursor_for,
+            attributes_to_get=attributes_to_get,
+            consistent_read=consistent_read,
+            identity_map=get_identity_map(info),
+            resolve_items=not isinstance(iterable, RelationshipResultList) or self.reads_items(connection, info),
         )
 
-        try:
-            start_cursor = to_cursor(iterable[0])
-            end_cursor = to_cursor(iterable[-1])
-        except IndexError:
-            start_cursor = None
-            end_cursor = None
+        start_cursor = edges[0].cursor if edges else None
+        end_cursor = edges[-1].cursor if edges else None
+
+        if result_iterator is not None:
+            # DynamoDB returns a last_evaluated_key whenever it stopped before the end of the table.
+            # When the last page ends exactly on the limit, the following page comes back empty.
+            last_evaluated_key = result_iterator.last_evaluated_key
+            if backward:
+                has_previous_page = last_evaluated_key is not None
+                has_next = bool(before)
+                if has_previous_page and with_cursors:
+                    start_cursor = key_to_cursor(model, last_evaluated_key)
+            else:
+                has_next = last_evaluated_key is not None
+                if has_next and with_cursors:
+                    end_cursor = key_to_cursor(model, last_evaluated_key)
 
         optional_args = {}
-        total_count = len(iterable)
+        if total_count is None:
+            total_count = len(edges)
         if "total_count" in connection._meta.fields:
             optional_args["total_count"] = total_count
 
@@ -104,40 +272,162 @@ class PynamoConnectionField(relay.ConnectionField):
     def get_resolver(self, parent_resolver):
         return partial(self.connection_resolver, parent_resolver, self.type, self.model)
 
+    @staticmethod
+    def get_iterable_after(iterable, model, after):
+        """The part of iterable following the item of a decoded after cursor, empty when it does not hold the item"""
+        if isinstance(iterable, RelationshipResultList):
+            start = iterable.position_after(after)
+            return iterable[start:] if start is not None else []
+
+        key_codec = get_key_codec(model)
+        after_key = key_codec.get_cursor_key(after)
+        if not isinstance(iterable, list):
+            iterable = iter(iterable)
+        after_index = next((i for i, item in enumerate(iterable) if key_codec.get_key(item) == after_key), None)
+        if after_index is None:
+            return []
+        # an iterator is already positioned right after the matching item
+        return iterable[after_index + 1:] if isinstance(iterable, list) else iterable
+
     @classmethod
     def get_edges_from_iterable(
-        cls, iterable, model, info, edge_type=Edge, after=None, page_size=None
+        cls, iterable, model, info, edge_type=Edge, after=None, page_size=None, cursor_for=to_cursor,
+        attributes_to_get=None, consistent_read=None, identity_map=None, resolve_items=True
     ):
         has_next = False
 
-        key_name = get_key_name(model)
-        after_index = 0
         if after:
-            after_index = next(
-                (
-                    i
-                    for i, item in enumerate(iterable)
-                    if str(getattr(item, key_name)) == after
-                ),
-                None,
-            )
-            if after_index is None:
-                return None
-            else:
-                after_index += 1
+            iterable = cls.get_iterable_after(iterable, model, after)
 
-        if page_size:
-            has_next = len(iterable) - after_index > page_size
-            iterable = iterable[after_index : after_index + page_size]
+        if isinstance(iterable, list):
+            if page_size:
+                has_next = len(iterable) > page_size
+                iterable = iterable[:page_size]
         else:
-            iterable = iterable[after_index:]
+            # stop pulling from the iterator as soon as we know whether there is a next page
+            iterable = list(islice(iterable, page_size + 1 if page_size else None))
+            if page_size and len(iterable) > page_size:
+                has_next = True
+                del iterable[page_size:]
 
         # trigger a batch get to speed up query instead of relying on lazy individual gets
-        if isinstance(iterable, RelationshipResultList):
-            iterable = iterable.resolve()
+        shared = isinstance(iterable, RelationshipResultList)
+        if shared and not resolve_items:
+            # key only selections are answered by the lazy proxies, deleted items included, without a read
+            key_codec = get_key_codec(model)
+            cursors = [
+                key_codec.get_position_cursor(position, key) if cursor_for else None
+                for position, key in enumerate(iterable._keys, iterable._offset)
+            ]
+            iterable = list(iterable)
+        elif shared:
+            # relationship cursors hold the position of their item, after finds it again without a scan
+            key_codec = get_key_codec(model)
+            entries = [
+                (entity, (position, key))
+                for entity, position, key in zip(
+                    iterable.resolve(
+                        attributes_to_get=attributes_to_get, consistent_read=consistent_read,
+                        identity_map=identity_map,
+                    ),
+                    range(iterable._offset, iterable._offset + len(iterable._keys)),
+                    iterable._keys,
+                )
+                # relationships may point to deleted items
+                if entity is not None
+            ]
+            iterable = [entity for entity, _ in entries]
+            cursors = [
+                key_codec.get_position_cursor(position, key) if cursor_for else None for _, (position, key) in entries
+            ]
+        else:
+            iterable = [entity for entity in iterable if entity is not None]
+            # cursors come from the items as read, the identity map may hold other copies
+            cursors = [cursor_for(entity) for entity in iterable] if cursor_for else [None] * len(iterable)
+        if identity_map is not None and not shared:
+            # share the items read by the query with the rest of the request
+            iterable = [
+                identity_map.add(entity, attributes_to_get)
+                if isinstance(entity, model) and not isinstance(entity, RelationshipResult) else entity
+                for entity in iterable
+            ]
 
-        edges = [
-            edge_type(node=entity, cursor=to_cursor(entity)) for entity in iterable
-        ]
+        edges = [edge_type(node=entity, cursor=cursor) for entity, cursor in zip(iterable, cursors)]
 
         return [has_next, edges]
+
+
+class PynamoNodesField(Field):
+    """Root field resolving a list of global IDs, nodes(ids: [ID!]!).
+
+    The items of PynamoObjectTypes are read together in chunked, concurrent BatchGetItem calls across their tables
+    rather than one get each. Nodes come back in the order of ids, null for missing items and unknown IDs.
+    """
+
+    def __init__(self, node=relay.Node, **kwargs):
+        kwargs.setdefault("ids", NonNull(List(NonNull(ID))))
+        super(PynamoNodesField, self).__init__(List(node), resolver=self.resolve_nodes, **kwargs)
+
+    @staticmethod
+    def get_node_type(info, global_id):
+        """The node type and the id of a global ID, (None, None) when it names no node type of the schema"""
+        try:
+            type_name, id = from_global_id(global_id)
+        except Exception:
+            return None, None
+        graphene_type = getattr(info.schema.get_type(type_name), "graphene_type", None)
+        if graphene_type is None or not relay.is_node(graphene_type):
+            return None, None
+        return graphene_type, id
+
+    def resolve_nodes(self, root, info, ids):
+        nodes = [None] * len(ids)
+        # (model, key, attributes_to_get, consistent_read) of the items to read and their positions
+        keys, positions = [], []
+        projections = {}
+        for position, global_id in enumerate(ids):
+            graphene_type, id = self.get_node_type(info, global_id)
+            if graphene_type is None:
+                continue
+            model = getattr(graphene_type._meta, "model", None)
+            if not is_valid_pynamo_model(model):
+                nodes[position] = graphene_type.get_node(info, id)
+                continue
+            if graphene_type not in projections:
+                attributes_to_get = get_attributes_to_get(graphene_type, info)
+                projections[graphene_type] = tuple(attributes_to_get) if attributes_to_get is not None else None
+            try:
+                key = graphene_type.get_node_key(id)
+            except ValueError:
+                # malformed IDs resolve to null like unknown ones, they do not fail the other nodes
+                continue
+            keys.append((model, key, projections[graphene_type], get_consistent_read(graphene_type, info, key=key)))
+            positions.append(position)
+
+        identity_map = get_identity_map(info)
+        client = get_async_client(info)
+        if client is not None:
+            return self.resolve_nodes_async(client, nodes, keys, positions, identity_map)
+
+        for position, item in zip(positions, batch_get_keys(keys, identity_map=identity_map)):
+            nodes[position] = item
+        return nodes
+
+    @staticmethod
+    async def resolve_nodes_async(client, nodes, keys, positions, identity_map=None):
+        """resolve_nodes on an AsyncDynamoClient, one concurrent batch_get per model and projection"""
+        groups = OrderedDict()
+        for position, (model, key, attributes_to_get, consistent_read) in zip(positions, keys):
+            groups.setdefault((model, attributes_to_get, consistent_read), []).append((position, key))
+        results = await asyncio.gather(*(
+            batch_get_items_async(
+                client, model, [key for _, key in group],
+                attributes_to_get=list(attributes_to_get) if attributes_to_get is not None else None,
+                consistent_read=consistent_read or None, identity_map=identity_map,
+            )
+            for (model, attributes_to_get, consistent_read), group in groups.items()
+        ))
+        for group, items in zip(groups.values(), results):
+            for position, key in group:
+                nodes[position] = items.get(key)
+        return nodes
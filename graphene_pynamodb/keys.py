@@ -0,0 +1,231 @@
+"""Compact encoding of item keys for node IDs and cursors.
+
+An encoded key is a format version byte followed by the typed values of the model's key attributes, in key order,
+as unpadded urlsafe base64. Cursors also carry the index keys of index queries, the segment positions of parallel
+scans, or the position of an item in a relationship list. Node IDs of models without a range key stay the hash key
+itself, and JSON cursors of earlier versions still decode.
+"""
+import base64
+import binascii
+import json
+
+from graphql_relay import from_global_id
+from pynamodb.attributes import NumberAttribute
+
+FORMAT_VERSION = 1
+
+# cursor payloads
+KEY, SEGMENTS, POSITION = 1, 2, 3
+# positions of a segment in a parallel scan cursor
+SEGMENT_START, SEGMENT_EXHAUSTED, SEGMENT_KEY = 0, 1, 2
+
+# attribute value types of key attributes
+TYPE_CODES = {"S": 1, "N": 2, "B": 3}
+TYPE_NAMES = dict((code, name) for name, code in TYPE_CODES.items())
+
+URLSAFE = bytes.maketrans(b"+/", b"-_")
+
+KEY_CODECS = {}
+
+
+def _write_varint(out, value):
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data, offset):
+    value = shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+
+
+def _write_string(out, value):
+    value = value.encode("utf-8")
+    _write_varint(out, len(value))
+    out += value
+
+
+def _read_string(data, offset):
+    length, offset = _read_varint(data, offset)
+    return data[offset:offset + length].decode("utf-8"), offset + length
+
+
+def _write_value(out, attribute_value):
+    ((type_name, value),) = attribute_value.items()
+    out.append(TYPE_CODES[type_name])
+    _write_string(out, value)
+
+
+def _read_value(data, offset):
+    type_name = TYPE_NAMES[data[offset]]
+    value, offset = _read_string(data, offset + 1)
+    return {type_name: value}, offset
+
+
+def _encode(data):
+    return binascii.b2a_base64(data, newline=False).rstrip(b"=").translate(URLSAFE).decode("ascii")
+
+
+def _decode(encoded):
+    return base64.urlsafe_b64decode(encoded + "=" * (-len(encoded) % 4))
+
+
+class KeyCodec(object):
+    """Reads and encodes the keys of one model, compiled once per model, see get_key_codec"""
+
+    def __init__(self, model):
+        self.model = model
+        self.attributes = [attr for attr in (model._hash_key_attribute(), model._range_key_attribute()) if attr]
+        self.names = [attr.attr_name for attr in self.attributes]
+        # (python name, serialize, type code) of the key attributes, so that items are read without reflection
+        self._accessors = [
+            (model._dynamo_to_python_attr(attr.attr_name), attr.serialize, TYPE_CODES[attr.attr_type])
+            for attr in self.attributes
+        ]
+        self._names = [name for name, _, _ in self._accessors]
+        self._cursor_prefix = bytes([FORMAT_VERSION, KEY])
+
+    def get_key(self, item):
+        """Key of item, its hash key or a (hash, range) tuple"""
+        # straight from the attribute values, past the attribute descriptors
+        values = item.attribute_values
+        if len(self._names) == 1:
+            return values.get(self._names[0])
+        return tuple(values.get(name) for name in self._names)
+
+    def _write_values(self, out, values):
+        """Writes the python values of the key attributes, in key order"""
+        for (_, serialize, type_code), value in zip(self._accessors, values):
+            # NumberAttribute serializes ints with json.dumps, which str matches
+            value = (str(value) if type(value) is int else serialize(value)).encode("utf-8")
+            out.append(type_code)
+            _write_varint(out, len(value))
+            out += value
+
+    def get_cursor(self, item):
+        """Cursor resuming a read right after item, the same as to_cursor of its last_evaluated_key"""
+        out = bytearray(self._cursor_prefix)
+        values = item.attribute_values
+        self._write_values(out, [values.get(name) for name in self._names])
+        # no index keys
+        out.append(0)
+        return _encode(out)
+
+    def get_position_cursor(self, position, key):
+        """Cursor of the item of key at position in a relationship list, found again without a scan"""
+        out = bytearray([FORMAT_VERSION, POSITION])
+        _write_varint(out, position)
+        self._write_values(out, key if len(self._names) > 1 else (key,))
+        return _encode(out)
+
+    def get_cursor_key(self, cursor):
+        """The key of the item a decoded cursor points at, typed like the key attributes"""
+        if "position" in cursor:
+            return cursor["key"]
+        key = tuple(attr.deserialize(cursor[attr.attr_name][attr.attr_type]) for attr in self.attributes)
+        return key if len(key) > 1 else key[0]
+
+    def _read_typed_key(self, data, offset):
+        key = []
+        for attr in self.attributes:
+            value, offset = _read_value(data, offset)
+            key.append(attr.deserialize(value[attr.attr_type]))
+        return (tuple(key) if len(key) > 1 else key[0]), offset
+
+    def write_key(self, out, key):
+        """Writes a last_evaluated_key, {name: {type: value}}, its index keys after the table keys"""
+        for name in self.names:
+            _write_value(out, key[name])
+        index_names = [name for name in key if name not in self.names]
+        _write_varint(out, len(index_names))
+        for name in index_names:
+            _write_string(out, name)
+            _write_value(out, key[name])
+
+    def read_key(self, data, offset):
+        key = {}
+        for name in self.names:
+            key[name], offset = _read_value(data, offset)
+        count, offset = _read_varint(data, offset)
+        for _ in range(count):
+            name, offset = _read_string(data, offset)
+            key[name], offset = _read_value(data, offset)
+        return key, offset
+
+    def to_id(self, key):
+        """Node ID of a hash key or a (hash, range) tuple"""
+        if len(self.attributes) == 1:
+            return key
+        out = bytearray([FORMAT_VERSION])
+        self._write_values(out, key)
+        return _encode(out)
+
+    def from_id(self, id):
+        """The key of a node ID, typed like the key attributes"""
+        if len(self.attributes) == 1:
+            return int(id) if isinstance(self.attributes[0], NumberAttribute) else id
+        try:
+            data = _decode(id)
+            if data[0] != FORMAT_VERSION:
+                raise ValueError("Unknown key encoding version %d" % data[0])
+            return self._read_typed_key(data, 1)[0]
+        except (IndexError, KeyError, UnicodeDecodeError, ValueError) as error:
+            raise ValueError("Invalid %s ID %r: %s" % (self.model.__name__, id, error))
+
+    def to_cursor(self, last_evaluated_key):
+        """Cursor of a last_evaluated_key, or of the {"segments": [...]} positions of a parallel scan"""
+        out = bytearray([FORMAT_VERSION])
+        if "segments" in last_evaluated_key:
+            out.append(SEGMENTS)
+            _write_varint(out, len(last_evaluated_key["segments"]))
+            for position in last_evaluated_key["segments"]:
+                if position is None:
+                    out.append(SEGMENT_START)
+                # planner.EXHAUSTED
+                elif position is False:
+                    out.append(SEGMENT_EXHAUSTED)
+                else:
+                    out.append(SEGMENT_KEY)
+                    self.write_key(out, position)
+        else:
+            out.append(KEY)
+            self.write_key(out, last_evaluated_key)
+        return _encode(out)
+
+    def from_cursor(self, cursor):
+        try:
+            data = _decode(cursor)
+            if data[:1] != bytes([FORMAT_VERSION]):
+                # JSON in a global ID, as written before this encoding
+                return json.loads(from_global_id(cursor)[1])
+            if data[1] == KEY:
+                return self.read_key(data, 2)[0]
+            if data[1] == POSITION:
+                position, offset = _read_varint(data, 2)
+                return {"position": position, "key": self._read_typed_key(data, offset)[0]}
+            count, offset = _read_varint(data, 2)
+            segments = []
+            for _ in range(count):
+                kind, offset = data[offset], offset + 1
+                if kind == SEGMENT_KEY:
+                    position, offset = self.read_key(data, offset)
+                else:
+                    position = None if kind == SEGMENT_START else False
+                segments.append(position)
+            return {"segments": segments}
+        except (IndexError, KeyError, UnicodeDecodeError, ValueError) as error:
+            raise ValueError("Invalid cursor %r: %s" % (cursor, error))
+
+
+def get_key_codec(model):
+    """The KeyCodec of model, built once"""
+    if model not in KEY_CODECS:
+        KEY_CODECS[model] = KeyCodec(model)
+    return KEY_CODECS[model]
@@ -0,0 +1,278 @@
+import random
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from promise import Promise
+from promise.dataloader import DataLoader
+from pynamodb.constants import BATCH_GET_ITEM, BATCH_GET_PAGE_LIMIT
+from pynamodb.exceptions import GetError
+from pynamodb.expressions.projection import create_projection_expression
+from pynamodb.settings import OperationSettings
+
+from graphene_pynamodb.cache import NOT_FOUND, cache_item, get_cache_ttl, get_cached_item, get_identity_map
+from graphene_pynamodb.executors import get_executor
+from graphene_pynamodb.utils import get_context_value, get_raw_key, get_request_store, get_typed_key, serialize_key
+
+# name of the loaders of a request in its context
+CONTEXT_KEY = "pynamodb_loaders"
+# context entry turning breadth first resolution on
+BREADTH_FIRST_KEY = "breadth_first"
+
+
+def batch_get_items(model, keys, attributes_to_get=None, consistent_read=None, chunk_size=BATCH_GET_PAGE_LIMIT,
+                    max_workers=8, max_retries=8, base_backoff=0.05, max_backoff=2.0, identity_map=None):
+    """Loads items by key with BatchGetItem, returns a dict of the items found by key.
+
+    Duplicate keys are read once. Keys go in chunks of at most 100, read concurrently by up to max_workers threads.
+    Unprocessed keys, returned when throttled or past the 16MB of a response, are read again after a jittered
+    exponential backoff and GetError is raised once max_retries is spent. Models with large items can lower
+    chunk_size so that responses stay under 16MB.
+
+    With an identity_map, the items it holds are not read again and the items read are added to it. Models
+    with a Meta.cache_ttl go through the item cache and are read whole.
+    """
+    items, wanted, attributes_to_get = get_known_items(model, keys, attributes_to_get, consistent_read, identity_map)
+    if not wanted:
+        return items
+    chunks = get_key_chunks(wanted, chunk_size)
+
+    def get_chunk(chunk):
+        raw_items = []
+        for attempt in range(max_retries + 1):
+            page, chunk = model._batch_get_page(
+                chunk,
+                consistent_read=consistent_read,
+                attributes_to_get=attributes_to_get,
+                settings=OperationSettings.default,
+            )
+            raw_items.extend(page or [])
+            if not chunk:
+                return raw_items
+            if attempt < max_retries:
+                # full jitter keeps the retries of concurrent chunks apart
+                time.sleep(get_backoff(attempt, base_backoff, max_backoff))
+        raise GetError("%d keys of %s were still unprocessed after %d retries" % (
+            len(chunk), model.__name__, max_retries))
+
+    if len(chunks) == 1:
+        pages = [get_chunk(chunks[0])]
+    else:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(chunks))) as pool:
+            pages = list(pool.map(get_chunk, chunks))
+
+    return add_read_items(model, items, wanted, pages, attributes_to_get, identity_map)
+
+
+def get_backoff(attempt, base_backoff, max_backoff):
+    return random.uniform(0, min(max_backoff, base_backoff * 2 ** attempt))
+
+
+def get_known_items(model, keys, attributes_to_get=None, consistent_read=None, identity_map=None):
+    """Splits keys into the items the identity map or the item cache hold, and the keys left to read.
+
+    Returns the items found by key, the keys to read as an OrderedDict of raw key -> (serialized key, [keys]) and
+    the projection to read them with, None for cached models.
+    """
+    items = {}
+    if identity_map is not None:
+        for key in keys:
+            item = identity_map.get(model, key, attributes_to_get)
+            if item is not None:
+                items[key] = item
+        keys = [key for key in keys if key not in items]
+
+    if get_cache_ttl(model):
+        attributes_to_get = None
+        missing = set()
+        if not consistent_read:
+            for key in keys:
+                item = get_cached_item(model, key)
+                if item is NOT_FOUND:
+                    missing.add(key)
+                elif item is not None:
+                    items[key] = identity_map.add(item) if identity_map is not None else item
+            keys = [key for key in keys if key not in items and key not in missing]
+
+    # duplicate keys are read once, every copy maps to the same item
+    wanted = OrderedDict()
+    for key in keys:
+        raw_key = serialize_key(model, key)
+        wanted.setdefault(get_raw_key(model, raw_key), (raw_key, []))[1].append(key)
+    return items, wanted, attributes_to_get
+
+
+def get_keys_and_attributes(keys, attributes_to_get=None, consistent_read=None):
+    """The request of one table in a BatchGetItem call, for keys from get_typed_key"""
+    request = {"Keys": keys}
+    if attributes_to_get is not None:
+        names = {}
+        request["ProjectionExpression"] = create_projection_expression(attributes_to_get, names)
+        request["ExpressionAttributeNames"] = dict((placeholder, name) for name, placeholder in names.items())
+    if consistent_read:
+        request["ConsistentRead"] = True
+    return request
+
+
+def get_key_chunks(wanted, chunk_size=BATCH_GET_PAGE_LIMIT):
+    chunk_size = min(chunk_size, BATCH_GET_PAGE_LIMIT)
+    raw_keys = [raw_key for raw_key, _ in wanted.values()]
+    return [raw_keys[i:i + chunk_size] for i in range(0, len(raw_keys), chunk_size)]
+
+
+def add_read_items(model, items, wanted, pages, attributes_to_get=None, identity_map=None):
+    """Adds the raw items of pages to items under every key that asked for them, caching them for cached models"""
+    for page in pages:
+        for raw_item in page:
+            item = model.from_raw_data(raw_item)
+            if identity_map is not None:
+                item = identity_map.add(item, attributes_to_get)
+            for key in wanted.get(get_raw_key(model, raw_item), (None, ()))[1]:
+                items[key] = item
+
+    if get_cache_ttl(model):
+        for _, keys in wanted.values():
+            cache_item(model, keys[0], items.get(keys[0]))
+    return items
+
+
+def batch_get_tables(requests, chunk_size=BATCH_GET_PAGE_LIMIT, max_workers=8, max_retries=8, base_backoff=0.05,
+                     max_backoff=2.0, identity_map=None):
+    """Loads items of several models in BatchGetItem calls spanning their tables, returns {model: {key: item}}.
+
+    requests maps models to (keys, attributes_to_get, consistent_read). The keys of all the models share chunks of
+    at most 100 keys, read concurrently and retried like batch_get_items does.
+    """
+    results, pending = {}, []
+    for model, (keys, attributes_to_get, consistent_read) in requests.items():
+        results[model], wanted, attributes_to_get = get_known_items(
+            model, keys, attributes_to_get, consistent_read, identity_map)
+        if wanted:
+            pending.append((model, wanted, attributes_to_get, consistent_read))
+
+    # a chunk goes to one endpoint and holds the keys of one model per table:
+    # [endpoint, key count, {table name: (model, keys, attributes_to_get, consistent_read)}]
+    chunk_size = min(chunk_size, BATCH_GET_PAGE_LIMIT)
+    chunks = []
+    for model, wanted, attributes_to_get, consistent_read in pending:
+        endpoint, table_name = (model.Meta.region, model.Meta.host), model.Meta.table_name
+        for raw_key, _ in wanted.values():
+            chunk = chunks[-1] if chunks else None
+            if chunk is None or chunk[0] != endpoint or chunk[1] == chunk_size or \
+                    chunk[2].get(table_name, (model,))[0] is not model:
+                chunk = [endpoint, 0, OrderedDict()]
+                chunks.append(chunk)
+            chunk[1] += 1
+            table = chunk[2].setdefault(table_name, (model, [], attributes_to_get, consistent_read))
+            table[1].append(get_typed_key(model, raw_key))
+
+    def get_chunk(chunk):
+        tables = chunk[2]
+        connection = next(iter(tables.values()))[0]._get_connection().connection
+        request_items = dict(
+            (table_name, get_keys_and_attributes(keys, attributes_to_get, consistent_read))
+            for table_name, (_, keys, attributes_to_get, consistent_read) in tables.items()
+        )
+        raw_items = dict((table_name, []) for table_name in tables)
+        for attempt in range(max_retries + 1):
+            data = connection.dispatch(BATCH_GET_ITEM, {"RequestItems": request_items})
+            for table_name, page in data.get("Responses", {}).items():
+                raw_items[table_name].extend(page)
+            unprocessed = data.get("UnprocessedKeys")
+            if not unprocessed:
+                return raw_items
+            request_items = dict(
+                (table_name, dict(request_items[table_name], Keys=request["Keys"]))
+                for table_name, request in unprocessed.items()
+            )
+            if attempt < max_retries:
+                time.sleep(get_backoff(attempt, base_backoff, max_backoff))
+        raise GetError("%d keys of %s were still unprocessed after %d retries" % (
+            sum(len(request["Keys"]) for request in request_items.values()), ", ".join(request_items), max_retries))
+
+    if len(chunks) == 1:
+        pages = [get_chunk(chunks[0])]
+    elif chunks:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(chunks))) as pool:
+            pages = list(pool.map(get_chunk, chunks))
+
+    for model, wanted, attributes_to_get, _ in pending:
+        model_pages = [page.get(model.Meta.table_name, []) for page in pages]
+        add_read_items(model, results[model], wanted, model_pages, attributes_to_get, identity_map)
+    return results
+
+
+def batch_get_keys(keys, identity_map=None, **kwargs):
+    """Loads the items of (model, key, attributes_to_get, consistent_read) tuples of any models in shared
+    BatchGetItem calls, returns them in order with None for the missing ones.
+
+    The keys of a model are read with the union of the projections asked for, consistently if any asks for it.
+    """
+    requests = OrderedDict()
+    for model, key, attributes_to_get, consistent_read in keys:
+        model_keys, projection, consistent = requests.get(model, ([], set(), False))
+        model_keys.append(key)
+        requests[model] = (
+            model_keys,
+            None if projection is None or attributes_to_get is None else projection | set(attributes_to_get),
+            consistent or bool(consistent_read),
+        )
+    results = batch_get_tables(
+        OrderedDict(
+            (model, (model_keys, sorted(projection) if projection is not None else None, consistent or None))
+            for model, (model_keys, projection, consistent) in requests.items()
+        ),
+        identity_map=identity_map,
+        **kwargs
+    )
+    return [results[model].get(key) for model, key, _, _ in keys]
+
+
+class BatchLoader(DataLoader):
+    """Loads items of any model, the keys requested in the same execution tick share BatchGetItem calls across tables.
+
+    Keys are (model, key, attributes_to_get, consistent_read) tuples, with attributes_to_get a tuple or None.
+    """
+
+    def __init__(self, identity_map=None, executor=None, **kwargs):
+        super(BatchLoader, self).__init__(**kwargs)
+        self.identity_map = identity_map
+        self.executor = executor
+
+    def batch_load_fn(self, keys):
+        if self.executor is not None:
+            return self.executor.submit(self.load_items, keys)
+        return Promise.resolve(self.load_items(keys))
+
+    def load_items(self, keys):
+        return batch_get_keys(keys, identity_map=self.identity_map)
+
+
+def is_breadth_first(info):
+    """Whether the request resolves relationships breadth first, from the breadth_first entry of its context"""
+    return bool(get_context_value(info, BREADTH_FIRST_KEY))
+
+
+def get_batch_loader(info):
+    """Returns the BatchLoader of the current request, None when the request has no context to hold it"""
+    loaders = get_request_store(info, CONTEXT_KEY)
+    if loaders is None:
+        return None
+    loader_key = BatchLoader, threading.get_ident()
+    if loader_key not in loaders:
+        loaders[loader_key] = BatchLoader(identity_map=get_identity_map(info), executor=get_executor(info))
+    return loaders[loader_key]
+
+
+def load_item(info, model, key, attributes_to_get=None, consistent_read=False):
+    """Promise of the item of key, None when it is missing, read by the BatchLoader of the request"""
+    attributes_to_get = tuple(attributes_to_get) if attributes_to_get is not None else None
+    return get_batch_loader(info).load((model, key, attributes_to_get, bool(consistent_read)))
+
+
+def load_items(info, model, keys, attributes_to_get=None, consistent_read=False):
+    """Promise of the items of keys, None for the missing ones, read by the BatchLoader of the request"""
+    attributes_to_get = tuple(attributes_to_get) if attributes_to_get is not None else None
+    return get_batch_loader(info).load_many(
+        [(model, key, attributes_to_get, bool(consistent_read)) for key in keys])
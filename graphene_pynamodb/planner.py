@@ -0,0 +1,462 @@
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from pynamodb.attributes import BooleanAttribute, NumberAttribute, UnicodeAttribute, UTCDateTimeAttribute
+from pynamodb.constants import ALL
+from pynamodb.indexes import GlobalSecondaryIndex, LocalSecondaryIndex
+
+from graphene import ID, Boolean, Float, InputField, InputObjectType, List, String
+from graphene_pynamodb.loaders import batch_get_items
+from graphene_pynamodb.keys import get_key_codec
+from graphene_pynamodb.utils import get_last_evaluated_key, get_model_fields, key_to_cursor
+
+SCAN = "scan"
+QUERY = "query"
+INDEX_QUERY = "index_query"
+BATCH_GET = "batch_get"
+
+# segment position stored in parallel scan cursors once a segment has been read to the end
+EXHAUSTED = False
+
+FILTER_OPERATORS = OrderedDict([
+    ("eq", lambda attr, value: attr == value),
+    ("ne", lambda attr, value: attr != value),
+    ("lt", lambda attr, value: attr < value),
+    ("lte", lambda attr, value: attr <= value),
+    ("gt", lambda attr, value: attr > value),
+    ("gte", lambda attr, value: attr >= value),
+    ("between", lambda attr, value: attr.between(*value)),
+    ("begins_with", lambda attr, value: attr.startswith(value)),
+    ("contains", lambda attr, value: attr.contains(value)),
+    ("exists", lambda attr, value: attr.exists() if value else attr.does_not_exist()),
+    ("in", lambda attr, value: attr.is_in(*value)),
+])
+# the operators DynamoDB accepts in a key condition on the range key
+RANGE_KEY_OPERATORS = ("eq", "lt", "lte", "gt", "gte", "between", "begins_with")
+
+# attribute class -> (name, scalar, operators) of the filter input type for its values
+FILTER_INPUTS = [
+    (BooleanAttribute, "BooleanFilter", Boolean, ("eq", "ne", "exists", "in")),
+    (NumberAttribute, "FloatFilter", Float, ("eq", "ne", "lt", "lte", "gt", "gte", "between", "exists", "in")),
+    (UnicodeAttribute, "StringFilter", String, tuple(FILTER_OPERATORS)),
+    (UTCDateTimeAttribute, "DateTimeFilter", String, ("eq", "ne", "lt", "lte", "gt", "gte", "between", "exists", "in")),
+]
+
+filter_input_types = {}
+
+
+def get_model_indexes(model):
+    """Returns the secondary indexes of a model that project every attribute.
+
+    Indexes using a KEYS_ONLY or INCLUDE projection would return partial items,
+    so the planner never picks them.
+    """
+    model._get_indexes()
+    return [
+        index
+        for index in (model._index_classes or {}).values()
+        if index.Meta.projection.projection_type == ALL
+    ]
+
+
+def get_index_keys(index):
+    hash_key = range_key = None
+    for name, attr in index._get_attributes().items():
+        if attr.is_hash_key:
+            hash_key = name
+        elif attr.is_range_key:
+            range_key = name
+    return hash_key, range_key
+
+
+def get_batch_argument_name(model):
+    return "%s_in" % model._hash_keyname
+
+
+def get_key_arguments(model):
+    """Builds the connection arguments the planner knows how to turn into a key lookup."""
+    arguments = OrderedDict()
+    arguments[model._hash_keyname] = ID()
+    if model._range_keyname:
+        arguments[model._range_keyname] = String()
+    else:
+        arguments[get_batch_argument_name(model)] = List(ID)
+
+    for index in get_model_indexes(model):
+        for name in get_index_keys(index):
+            if name and name not in arguments:
+                arguments[name] = String()
+
+    return arguments
+
+
+def get_scalar_filter_type(attr):
+    for attribute_class, name, scalar, operators in FILTER_INPUTS:
+        if isinstance(attr, attribute_class):
+            break
+    else:
+        return None
+
+    if name not in filter_input_types:
+        fields = OrderedDict()
+        for operator in operators:
+            if operator in ("between", "in"):
+                fields[operator + "_" if operator == "in" else operator] = InputField(List(scalar), name=operator)
+            elif operator == "exists":
+                fields[operator] = InputField(Boolean)
+            else:
+                fields[operator] = InputField(scalar)
+        filter_input_types[name] = type(name, (InputObjectType,), fields)
+    return filter_input_types[name]
+
+
+def get_filter_type(object_type):
+    """Builds the input type of the filter argument, one field per filterable model attribute.
+
+    Returns None for models without filterable attributes, GraphQL input types can not be empty.
+    """
+    name = "%sFilter" % object_type._meta.name
+    if object_type not in filter_input_types:
+        fields = OrderedDict()
+        for attr_name, attr in get_model_fields(object_type._meta.model).items():
+            scalar_filter_type = get_scalar_filter_type(attr)
+            if scalar_filter_type:
+                fields[attr_name] = InputField(scalar_filter_type)
+        filter_input_types[object_type] = type(name, (InputObjectType,), fields) if fields else None
+    return filter_input_types[object_type]
+
+
+def to_attribute_value(attr, value):
+    if isinstance(attr, UTCDateTimeAttribute):
+        return attr.deserialize(value)
+    if isinstance(attr, NumberAttribute) and isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def to_key_value(model, name, value):
+    # arguments arrive as their DynamoDB string form, let the attribute parse them
+    attr = model.get_attributes()[name]
+    return attr.deserialize(str(value))
+
+
+class QueryPlan(object):
+    """A callable wrapping the cheapest pynamodb read that satisfies the connection arguments."""
+
+    def __init__(self, model, operation=SCAN, index=None, hash_key=None, range_key_condition=None, keys=None,
+                 total_segments=None, filter_condition=None):
+        self.model = model
+        self.operation = operation
+        self.index = index
+        self.hash_key = hash_key
+        self.range_key_condition = range_key_condition
+        self.filter_condition = filter_condition
+        self.keys = keys
+        self.total_segments = total_segments
+
+    def __repr__(self):
+        return "<QueryPlan %s on %s>" % (self.operation, self.model.__name__)
+
+    @property
+    def is_ordered(self):
+        """Queries on a range key return items in key order and can be read backwards."""
+        if self.operation == QUERY:
+            return self.model._range_keyname is not None
+        if self.operation == INDEX_QUERY:
+            return get_index_keys(self.index)[1] is not None
+        return False
+
+    def get_key_attributes(self):
+        """Attributes of the last_evaluated_key of this read: the table keys, and the index keys of an index query"""
+        attributes = self.model.get_attributes()
+        names = [name for name, attr in attributes.items() if attr.is_hash_key or attr.is_range_key]
+        if self.operation == INDEX_QUERY:
+            names += [name for name in get_index_keys(self.index) if name and name not in names]
+        return [(name, attributes[name]) for name in names]
+
+    def get_range_key_bound(self, last_evaluated_key):
+        """Range key condition restricting a table query to the items after a last_evaluated_key, None when the
+        read already has a range key condition or is not a table query"""
+        if self.operation != QUERY or self.range_key_condition is not None:
+            return None
+        attr = self.model._range_key_attribute()
+        return attr > attr.deserialize(last_evaluated_key[attr.attr_name][attr.attr_type])
+
+    def cursor_for(self, item):
+        """Cursor resuming this read right after item, built like the last_evaluated_key DynamoDB returns"""
+        return key_to_cursor(self.model, dict(
+            (attr.attr_name, item._serialize_value(attr, getattr(item, name)))
+            for name, attr in self.get_key_attributes()
+        ))
+
+    def __call__(self, identity_map=None, range_key_condition=None, **params):
+        if self.filter_condition is not None:
+            params["filter_condition"] = self.filter_condition
+        # a bound from get_range_key_bound replaces the missing range key condition of the plan
+        if range_key_condition is None:
+            range_key_condition = self.range_key_condition
+
+        if self.operation == QUERY:
+            return self.model.query(self.hash_key, range_key_condition=range_key_condition, **params)
+
+        if self.operation == INDEX_QUERY:
+            if isinstance(self.index, GlobalSecondaryIndex):
+                # global secondary indexes only support eventually consistent reads
+                params.pop("consistent_read", None)
+            return self.index.query(self.hash_key, range_key_condition=range_key_condition, **params)
+
+        if self.operation == BATCH_GET:
+            return self.batch_get(identity_map=identity_map, **params)
+
+        if self.total_segments and self.total_segments > 1:
+            return self.parallel_scan(**params)
+
+        return self.model.scan(**params)
+
+    def get_segment_starts(self, limit=None, last_evaluated_key=None):
+        """Where every segment of a parallel scan starts, and how many items each of them reads"""
+        total_segments = self.total_segments
+        starts = (last_evaluated_key or {}).get("segments") or [None] * total_segments
+        if len(starts) != total_segments:
+            raise ValueError(
+                "Cursor was created by a scan with %d segments, this scan uses %d" % (len(starts), total_segments)
+            )
+        # every segment reads its share of the page, the merged result is trimmed back to the limit
+        return starts, -(-limit // total_segments) if limit else None
+
+    def parallel_scan(self, limit=None, last_evaluated_key=None, **params):
+        total_segments = self.total_segments
+        starts, segment_limit = self.get_segment_starts(limit, last_evaluated_key)
+
+        def scan_segment(segment):
+            if starts[segment] is EXHAUSTED:
+                return [], EXHAUSTED
+            result = self.model.scan(
+                segment=segment,
+                total_segments=total_segments,
+                limit=segment_limit,
+                last_evaluated_key=starts[segment],
+                **params
+            )
+            items = list(result)
+            return items, result.last_evaluated_key or EXHAUSTED
+
+        with ThreadPoolExecutor(max_workers=total_segments) as pool:
+            pages = list(pool.map(scan_segment, range(total_segments)))
+
+        return ParallelScanResult(self.model, starts, pages, limit)
+
+    def batch_get(self, limit=None, last_evaluated_key=None, consistent_read=None, attributes_to_get=None,
+                  identity_map=None, **params):
+        keys = self.get_batch_keys(limit, last_evaluated_key)
+        if not keys:
+            return BatchGetResult([])
+
+        # the items the request already holds, or the item cache, are not read again
+        items = batch_get_items(
+            self.model, keys, attributes_to_get=attributes_to_get, consistent_read=consistent_read,
+            identity_map=identity_map,
+        )
+        return self.get_batch_result(keys, items)
+
+    def get_batch_keys(self, limit=None, last_evaluated_key=None):
+        """The keys of the page of a batch_get plan starting after last_evaluated_key"""
+        keys = self.keys
+        if last_evaluated_key:
+            hash_attr = self.model._hash_key_attribute()
+            last_key = hash_attr.deserialize(last_evaluated_key[hash_attr.attr_name][hash_attr.attr_type])
+            keys = keys[keys.index(last_key) + 1:] if last_key in keys else []
+        return keys[:limit] if limit else keys
+
+    def get_batch_result(self, keys, items):
+        last_evaluated_key = None
+        if keys[-1] != self.keys[-1]:
+            hash_attr = self.model._hash_key_attribute()
+            last_evaluated_key = {hash_attr.attr_name: {hash_attr.attr_type: self.model._serialize_keys(keys[-1])[0]}}
+        return BatchGetResult([items[key] for key in keys if key in items], last_evaluated_key)
+
+
+class BatchGetResult(list):
+    """Items of a batch_get plan, or of a read made ahead, with the last_evaluated_key a ResultIterator reports."""
+
+    def __init__(self, items, last_evaluated_key=None):
+        super(BatchGetResult, self).__init__(items)
+        self.last_evaluated_key = last_evaluated_key
+
+
+class ParallelScanResult(list):
+    """Items of a segmented scan, merged in segment order.
+
+    Cursors record the position of every segment so that ``after`` resumes all of them.
+    """
+
+    def __init__(self, model, starts, pages, limit=None):
+        self.model = model
+        self._starts = starts
+        self._ends = [end for _, end in pages]
+        self._fetched = [bool(items) for items, _ in pages]
+        entries = [(segment, item) for segment, (items, _) in enumerate(pages) for item in items]
+        self._truncated = bool(limit) and len(entries) > limit
+        if self._truncated:
+            entries = entries[:limit]
+        self._segments = dict((self._get_key(item), segment) for segment, item in entries)
+        super(ParallelScanResult, self).__init__(item for _, item in entries)
+
+    @staticmethod
+    def _get_key(item):
+        # by key rather than identity, the request may hand out another copy of the item
+        return get_key_codec(type(item)).get_key(item)
+
+    def segments_at(self, item):
+        segment = self._segments[self._get_key(item)]
+        positions = []
+        for other, (start, end) in enumerate(zip(self._starts, self._ends)):
+            if other < segment:
+                positions.append(end)
+            elif other == segment:
+                positions.append(get_last_evaluated_key(item))
+            else:
+                # later segments restart where they started unless they had nothing to give
+                positions.append(start if self._fetched[other] else end)
+        return positions
+
+    @property
+    def last_evaluated_key(self):
+        segments = self.segments_at(self[-1]) if self._truncated else self._ends
+        if all(position is EXHAUSTED for position in segments):
+            return None
+        return {"segments": segments}
+
+    def cursor_for(self, item):
+        return key_to_cursor(self.model, {"segments": self.segments_at(item)})
+
+
+def plan_query(model, args, total_segments=None):
+    """Picks Model.query, Index.query, batch_get or scan from the arguments, in that order.
+
+    Equality filters on key attributes drive the lookup like key arguments do. Other filters become the
+    range_key_condition of a query when they apply to its range key and its filter_condition otherwise.
+    Scans are split in ``total_segments`` segments read concurrently when it is set. A query on the hash key goes
+    to a local secondary index when the arguments constrain its range key and not the range key of the table.
+    """
+    values = dict(
+        (name, to_key_value(model, name, value))
+        for name, value in args.items()
+        if value is not None and name in model.get_attributes()
+    )
+    conditions = get_filter_conditions(model, args.get("filter"))
+    key_names = get_key_names(model)
+    for condition in list(conditions):
+        name, operator, value = condition
+        if operator == "eq" and name in key_names and name not in values:
+            values[name] = value
+            conditions.remove(condition)
+
+    hash_key_name, range_key_name = model._hash_keyname, model._range_keyname
+    batch_keys = args.get(get_batch_argument_name(model)) if not range_key_name else None
+    if batch_keys is not None:
+        keys = []
+        for key in batch_keys:
+            key = to_key_value(model, hash_key_name, key)
+            if key not in keys:
+                keys.append(key)
+
+    def constrains(name):
+        return name is not None and (name in values or any(
+            condition[0] == name and condition[1] in RANGE_KEY_OPERATORS for condition in conditions))
+
+    index = None
+    if hash_key_name in values:
+        operation = QUERY
+        # local secondary indexes share the hash key of the table, one of them narrows the query on its range key
+        local_indexes = [
+            (index, get_index_keys(index))
+            for index in get_model_indexes(model)
+            if isinstance(index, LocalSecondaryIndex) and constrains(get_index_keys(index)[1])
+        ]
+        if local_indexes and not constrains(range_key_name):
+            local_indexes.sort(key=lambda candidate: candidate[1][1] not in values)
+            operation = INDEX_QUERY
+            index, (hash_key_name, range_key_name) = local_indexes[0]
+    else:
+        candidates = [
+            (index, get_index_keys(index))
+            for index in get_model_indexes(model)
+            if get_index_keys(index)[0] in values
+        ]
+        if candidates:
+            # an index that also matches the range key narrows the read the most
+            candidates.sort(key=lambda candidate: candidate[1][1] not in values)
+            operation = INDEX_QUERY
+            index, (hash_key_name, range_key_name) = candidates[0]
+        elif batch_keys is not None and not values and not conditions:
+            return QueryPlan(model, BATCH_GET, keys=keys)
+        else:
+            operation = SCAN
+            hash_key_name = range_key_name = None
+            if batch_keys is not None:
+                conditions.append((model._hash_keyname, "in", keys))
+
+    # key values the read does not look up by still have to match
+    for name, value in values.items():
+        if name not in (hash_key_name, range_key_name):
+            conditions.append((name, "eq", value))
+
+    range_key_condition = None
+    if range_key_name in values:
+        range_key_condition = getattr(model, range_key_name) == values[range_key_name]
+    range_conditions = [
+        condition for condition in conditions
+        if range_key_name and condition[0] == range_key_name and condition[1] in RANGE_KEY_OPERATORS
+    ]
+    if range_conditions:
+        if range_key_condition is not None or len(range_conditions) > 1:
+            raise ValueError("DynamoDB queries accept a single condition on the range key %s" % range_key_name)
+        range_key_condition = compile_condition(model, *range_conditions[0])
+        conditions.remove(range_conditions[0])
+
+    filter_condition = None
+    for condition in conditions:
+        condition = compile_condition(model, *condition)
+        filter_condition = condition if filter_condition is None else filter_condition & condition
+
+    return QueryPlan(
+        model,
+        operation,
+        index=index,
+        hash_key=values.get(hash_key_name),
+        range_key_condition=range_key_condition,
+        filter_condition=filter_condition,
+        total_segments=total_segments,
+    )
+
+
+def get_key_names(model):
+    names = set([model._hash_keyname, model._range_keyname])
+    for index in get_model_indexes(model):
+        names.update(get_index_keys(index))
+    names.discard(None)
+    return names
+
+
+def get_filter_conditions(model, filters):
+    """Flattens the filter argument into (attribute name, operator, value) tuples."""
+    conditions = []
+    attributes = model.get_attributes()
+    for name, operators in (filters or {}).items():
+        for operator, value in (operators or {}).items():
+            if value is None:
+                continue
+            operator = operator.rstrip("_")
+            if operator in ("between", "in"):
+                value = [to_attribute_value(attributes[name], item) for item in value]
+            elif operator != "exists":
+                value = to_attribute_value(attributes[name], value)
+            conditions.append((name, operator, value))
+    return conditions
+
+
+def compile_condition(model, name, operator, value):
+    if operator == "between" and len(value) != 2:
+        raise ValueError("between on %s expects a lower and an upper bound, got %r" % (name, value))
+    return FILTER_OPERATORS[operator](getattr(model, name), value)
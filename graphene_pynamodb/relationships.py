@@ -4,6 +4,10 @@ from pynamodb.models import Model
 from six import string_types
 from wrapt import ObjectProxy
 
+from graphene_pynamodb.aio import batch_get_items_async
+from graphene_pynamodb.cache import get_cache_ttl, get_item
+from graphene_pynamodb.keys import get_key_codec
+from graphene_pynamodb.loaders import batch_get_items, batch_get_keys
 from graphene_pynamodb.utils import get_key_name
 
 
@@ -15,14 +19,47 @@ class RelationshipResult(ObjectProxy):
         self._self_key = key
         self._self_key_name = key_name
         self._self_model = obj
+        self._self_attributes_to_get = None
+        self._self_consistent_read = False
+        self._self_identity_map = None
 
     def __getattr__(self, name):
         if name == self._self_key_name:
             return self._self_key
         if not name.startswith('_') and isinstance(self.__wrapped__, type):
-            self.__wrapped__ = self._self_model.get(self._self_key)
+            self.__wrapped__ = self._self_load()
         return super(RelationshipResult, self).__getattr__(name)
 
+    def _self_load(self):
+        identity_map = self._self_identity_map
+        if identity_map is not None:
+            item = identity_map.get(self._self_model, self._self_key, self._self_attributes_to_get)
+            if item is not None:
+                return item
+
+        item = get_item(
+            self._self_model,
+            self._self_key,
+            attributes_to_get=self._self_attributes_to_get,
+            consistent_read=self._self_consistent_read,
+        )
+        if identity_map is not None:
+            item = identity_map.add(item, self._self_attributes_to_get if not get_cache_ttl(self._self_model) else None)
+        return item
+
+    def _self_set_projection(self, attributes_to_get):
+        """Restricts the attributes loaded for this item, None loads all of them.
+
+        An item already loaded with fewer attributes than asked for is loaded again.
+        """
+        current = self._self_attributes_to_get
+        if isinstance(self.__wrapped__, type):
+            self._self_attributes_to_get = attributes_to_get
+        elif current is not None and (attributes_to_get is None or not set(attributes_to_get) <= set(current)):
+            self._self_attributes_to_get = None if attributes_to_get is None else sorted(
+                set(current) | set(attributes_to_get))
+            self.__wrapped__ = self._self_model
+
     def __eq__(self, other):
         return isinstance(other, self._self_model) and self._self_key == getattr(other, self._self_key_name)
 
@@ -31,28 +68,92 @@ class RelationshipResult(ObjectProxy):
 
 
 class RelationshipResultList(list):
-    def __init__(self, hash_key_name, model, keys):
+    def __init__(self, hash_key_name, model, keys, items=None, offset=0):
         self._hash_key_name = hash_key_name
         self._model = model
         self._keys = keys
+        # items read ahead by key, see load_async
+        self._items = items
+        # position of the first key in the relationship this list was sliced from
+        self._offset = offset
+        # key -> position, built on the first cursor lookup
+        self._positions = None
         super(RelationshipResultList, self).__init__(keys)
 
     def __getitem__(self, item):
         if isinstance(item, slice):
-            return RelationshipResultList(self._hash_key_name, self._model, self._keys[item])
+            return RelationshipResultList(self._hash_key_name, self._model, self._keys[item], self._items,
+                                          self._offset + item.indices(len(self._keys))[0])
 
         return RelationshipResult(self._hash_key_name, self._keys[item], self._model)
 
     def __getslice__(self, i, j):
-        return RelationshipResultList(self._hash_key_name, self._model, self._keys[i:j])
+        return self[i:j]
 
     def __iter__(self):
         for key in self._keys:
             yield RelationshipResult(self._hash_key_name, key, self._model)
 
-    def resolve(self):
-        models = dict((getattr(entity, self._hash_key_name), entity) for entity in self._model.batch_get(self._keys))
-        return [models[key] for key in self._keys]
+    def resolve(self, attributes_to_get=None, consistent_read=None, identity_map=None):
+        """Loads the items in key order, None stands for the keys that have no item"""
+        if self._items is not None and all(key in self._items for key in self._keys):
+            return [self._items[key] for key in self._keys]
+        models = batch_get_items(
+            self._model, self._keys, attributes_to_get=attributes_to_get, consistent_read=consistent_read,
+            identity_map=identity_map,
+        )
+        return [models.get(key) for key in self._keys]
+
+    async def load_async(self, client, keys=None, attributes_to_get=None, consistent_read=None, identity_map=None):
+        """Reads the items of keys, all of them by default, on an AsyncDynamoClient so that resolve does not block"""
+        keys = self._keys if keys is None else keys
+        models = await batch_get_items_async(
+            client, self._model, keys, attributes_to_get=attributes_to_get, consistent_read=consistent_read,
+            identity_map=identity_map,
+        )
+        return self.set_items(keys, [models.get(key) for key in keys])
+
+    def position_after(self, cursor):
+        """Index of the key following the item of a decoded cursor, None when the list does not hold that item.
+
+        Position cursors are checked against the key at their position, others and stale ones go through an index
+        of the keys built once per list.
+        """
+        key = get_key_codec(self._model).get_cursor_key(cursor)
+        index = cursor.get("position", -1) - self._offset
+        if not 0 <= index < len(self._keys) or self._keys[index] != key:
+            if self._positions is None:
+                self._positions = {}
+                for position, other in enumerate(self._keys):
+                    self._positions.setdefault(other, position)
+            index = self._positions.get(key)
+        return None if index is None else index + 1
+
+    def set_items(self, keys, items):
+        """Keeps the items read ahead for keys, None for the keys that have no item, for resolve to return"""
+        self._items = dict(zip(keys, items))
+        return items
+
+
+def load_relationships(relationships, identity_map=None):
+    """Loads lazy RelationshipResults and RelationshipResultLists of any models in shared BatchGetItem calls, rather
+    than one call per item and per list. Missing items leave their RelationshipResult unloaded."""
+    keys = []
+    for relationship in relationships:
+        if isinstance(relationship, RelationshipResultList):
+            keys.extend((relationship._model, key, None, False) for key in relationship._keys)
+        elif isinstance(relationship, RelationshipResult) and isinstance(relationship.__wrapped__, type):
+            keys.append((relationship._self_model, relationship._self_key, relationship._self_attributes_to_get,
+                         relationship._self_consistent_read))
+    items = iter(batch_get_keys(keys, identity_map=identity_map))
+
+    for relationship in relationships:
+        if isinstance(relationship, RelationshipResultList):
+            relationship.set_items(relationship._keys, [next(items) for _ in relationship._keys])
+        elif isinstance(relationship, RelationshipResult) and isinstance(relationship.__wrapped__, type):
+            item = next(items)
+            if item is not None:
+                relationship.__wrapped__ = item
 
 
 class Relationship(Attribute):
@@ -105,7 +206,7 @@ class OneToOne(Relationship):
         if self._lazy:
             return RelationshipResult(self.hash_key_name, hash_key, self.model)
         else:
-            return self.model.get(hash_key)
+            return get_item(self.model, hash_key)
 
 
 class OneToMany(Relationship):
@@ -0,0 +1,313 @@
+"""Item cache backend shared by the worker processes of a host through a memory mapped file.
+
+The file holds a fixed number of fixed size slots, addressed by a hash of the cache key with a short linear probe.
+Readers never lock: every slot carries a sequence number, odd while a write is in progress, and a checksum, so a
+read racing a write is detected and counted as a miss. Writers serialize on a lock file, which every process opens
+for itself.
+"""
+import fcntl
+import hashlib
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+
+MAGIC = b"GPNC"
+FORMAT_VERSION = 1
+
+# magic, format version, slot count, slot size
+FILE_HEADER = struct.Struct("<4sHII")
+# sequence, key hash, expires at, key length, value length, checksum of key and value
+SLOT_HEADER = struct.Struct("<IQdHII")
+SEQUENCE = struct.Struct("<I")
+
+# slots tried from the home slot of a key
+PROBES = 8
+
+# attribute value types of the item encoding
+TYPE_CODES = {"S": 1, "N": 2, "B": 3, "BOOL": 4, "NULL": 5, "SS": 6, "NS": 7, "BS": 8, "L": 9, "M": 10}
+TYPE_NAMES = dict((code, name) for name, code in TYPE_CODES.items())
+
+
+def _default_path():
+    directory = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.path.join(directory, "graphene-pynamodb-cache")
+
+
+def _write_varint(out, value):
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data, offset):
+    value = shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+
+
+def _write_bytes(out, value):
+    if isinstance(value, str):
+        value = value.encode("utf-8")
+    _write_varint(out, len(value))
+    out += value
+
+
+def _read_bytes(data, offset):
+    length, offset = _read_varint(data, offset)
+    return bytes(data[offset:offset + length]), offset + length
+
+
+def _write_value(out, attribute_value):
+    ((type_name, value),) = attribute_value.items()
+    out.append(TYPE_CODES[type_name])
+    if type_name in ("S", "N", "B"):
+        _write_bytes(out, value)
+    elif type_name in ("BOOL", "NULL"):
+        out.append(1 if value else 0)
+    elif type_name in ("SS", "NS", "BS"):
+        _write_varint(out, len(value))
+        for element in value:
+            _write_bytes(out, element)
+    elif type_name == "L":
+        _write_varint(out, len(value))
+        for element in value:
+            _write_value(out, element)
+    else:
+        _write_map(out, value)
+
+
+def _read_value(data, offset):
+    type_name = TYPE_NAMES[data[offset]]
+    offset += 1
+    if type_name in ("S", "N"):
+        value, offset = _read_bytes(data, offset)
+        value = value.decode("utf-8")
+    elif type_name == "B":
+        value, offset = _read_bytes(data, offset)
+    elif type_name in ("BOOL", "NULL"):
+        value, offset = bool(data[offset]), offset + 1
+    elif type_name in ("SS", "NS", "BS"):
+        count, offset = _read_varint(data, offset)
+        value = []
+        for _ in range(count):
+            element, offset = _read_bytes(data, offset)
+            value.append(element if type_name == "BS" else element.decode("utf-8"))
+    elif type_name == "L":
+        count, offset = _read_varint(data, offset)
+        value = []
+        for _ in range(count):
+            element, offset = _read_value(data, offset)
+            value.append(element)
+    else:
+        value, offset = _read_map(data, offset)
+    return {type_name: value}, offset
+
+
+def _write_map(out, attributes):
+    _write_varint(out, len(attributes))
+    for name, attribute_value in attributes.items():
+        _write_bytes(out, name)
+        _write_value(out, attribute_value)
+
+
+def _read_map(data, offset):
+    count, offset = _read_varint(data, offset)
+    attributes = {}
+    for _ in range(count):
+        name, offset = _read_bytes(data, offset)
+        attributes[name.decode("utf-8")], offset = _read_value(data, offset)
+    return attributes, offset
+
+
+def encode_item(data):
+    """Encodes the raw data of an item, {name: {type: value}}, in a compact type tagged binary form"""
+    out = bytearray([FORMAT_VERSION])
+    _write_map(out, data)
+    return bytes(out)
+
+
+def decode_item(encoded):
+    if encoded[0] != FORMAT_VERSION:
+        raise ValueError("Unknown item encoding version %d" % encoded[0])
+    return _read_map(encoded, 1)[0]
+
+
+class SharedMemoryCache(object):
+    """Item cache backend in a memory mapped file, shared by every process that opens the same path.
+
+    Open it before forking or in every worker. Items larger than a slot are not cached, size slots for the items
+    of the cached models. The file name carries the dimensions, so workers deployed with other dimensions use
+    their own file and never resize one that is mapped.
+    """
+
+    def __init__(self, path=None, slots=65536, slot_size=1024):
+        self.path = "%s.%dx%d" % (path or _default_path(), slots, slot_size)
+        self.slots = slots
+        self.slot_size = slot_size
+        self._lock = threading.Lock()
+        # (pid, descriptor) of the lock file, see _lock_fd
+        self._lock_file = None
+        self._fd = self._open(FILE_HEADER.size + slots * slot_size)
+        self._map = mmap.mmap(self._fd, FILE_HEADER.size + slots * slot_size)
+
+    def _open(self, size):
+        """Opens the cache file, replacing a missing or unreadable one by a new file rather than in place"""
+        lock_fd = os.open(self.path + ".lock", os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            # one process creates the file, the others wait to open it
+            fcntl.flock(lock_fd, fcntl.LOCK_EX)
+            try:
+                fd = os.open(self.path, os.O_RDWR)
+            except FileNotFoundError:
+                fd = None
+            if fd is not None and (os.fstat(fd).st_size != size or self._read_header(fd) != (
+                    MAGIC, FORMAT_VERSION, self.slots, self.slot_size)):
+                os.close(fd)
+                fd = None
+            if fd is None:
+                directory, name = os.path.split(self.path)
+                temp_fd, temp_path = tempfile.mkstemp(prefix=name + ".", dir=directory)
+                try:
+                    # sparse, the slots read as empty
+                    os.ftruncate(temp_fd, size)
+                    os.pwrite(temp_fd, FILE_HEADER.pack(MAGIC, FORMAT_VERSION, self.slots, self.slot_size), 0)
+                    os.replace(temp_path, self.path)
+                except BaseException:
+                    os.close(temp_fd)
+                    os.unlink(temp_path)
+                    raise
+                fd = temp_fd
+            return fd
+        finally:
+            os.close(lock_fd)
+
+    @staticmethod
+    def _read_header(fd):
+        header = os.pread(fd, FILE_HEADER.size, 0)
+        return FILE_HEADER.unpack(header) if len(header) == FILE_HEADER.size else None
+
+    def _lock_fd(self):
+        """Descriptor of the lock file opened by this process.
+
+        flock locks belong to an open file description, which forked processes share with their parent: a
+        descriptor inherited through fork would not exclude the parent, so every process opens its own.
+        """
+        pid = os.getpid()
+        if self._lock_file is None or self._lock_file[0] != pid:
+            # the thread lock of the parent may have been held by another of its threads at fork time
+            self._lock = threading.Lock()
+            self._lock_file = pid, os.open(self.path + ".lock", os.O_RDWR | os.O_CREAT, 0o600)
+        return self._lock_file[1]
+
+    @contextmanager
+    def _file_lock(self):
+        # flock excludes other processes, the threads of this one share its lock file descriptor
+        lock_fd = self._lock_fd()
+        with self._lock:
+            fcntl.flock(lock_fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_fd, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _hash(key):
+        # 0 marks an empty slot
+        return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little") or 1
+
+    def _offsets(self, key_hash):
+        home = key_hash % self.slots
+        for probe in range(min(PROBES, self.slots)):
+            yield FILE_HEADER.size + ((home + probe) % self.slots) * self.slot_size
+
+    def get(self, key):
+        key = key.encode("utf-8")
+        key_hash = self._hash(key)
+        for offset in self._offsets(key_hash):
+            sequence, slot_hash, expires_at, key_length, value_length, checksum = SLOT_HEADER.unpack_from(
+                self._map, offset)
+            if slot_hash != key_hash or sequence & 1:
+                continue
+            start = offset + SLOT_HEADER.size
+            data = self._map[start:start + key_length + value_length]
+            # a write raced this read
+            if SEQUENCE.unpack_from(self._map, offset)[0] != sequence or zlib.crc32(data) != checksum:
+                return None
+            if data[:key_length] != key:
+                continue
+            if expires_at <= time.time():
+                return None
+            return decode_item(data[key_length:])
+        return None
+
+    def _write_slot(self, offset, key_hash, expires_at, key, value):
+        sequence = SEQUENCE.unpack_from(self._map, offset)[0]
+        SEQUENCE.pack_into(self._map, offset, (sequence + 1) & 0xFFFFFFFF)
+        data = key + value
+        self._map[offset + SLOT_HEADER.size:offset + SLOT_HEADER.size + len(data)] = data
+        SLOT_HEADER.pack_into(
+            self._map, offset, (sequence + 1) & 0xFFFFFFFF, key_hash, expires_at, len(key), len(value),
+            zlib.crc32(data)
+        )
+        SEQUENCE.pack_into(self._map, offset, (sequence + 2) & 0xFFFFFFFF)
+
+    def _find_slot(self, key, key_hash):
+        """Slot holding key, else a free or expired slot, else the slot expiring first"""
+        now = time.time()
+        free = oldest = None
+        for offset in self._offsets(key_hash):
+            _, slot_hash, expires_at, key_length, _, _ = SLOT_HEADER.unpack_from(self._map, offset)
+            if slot_hash == key_hash:
+                start = offset + SLOT_HEADER.size
+                if self._map[start:start + key_length] == key:
+                    return offset, True
+            if free is None and (slot_hash == 0 or expires_at <= now):
+                free = offset
+            if oldest is None or expires_at < oldest[1]:
+                oldest = offset, expires_at
+        return (free if free is not None else oldest[0]), False
+
+    def set(self, key, value, ttl):
+        key = key.encode("utf-8")
+        value = encode_item(value)
+        key_hash = self._hash(key)
+        with self._file_lock():
+            offset, found = self._find_slot(key, key_hash)
+            if SLOT_HEADER.size + len(key) + len(value) <= self.slot_size:
+                self._write_slot(offset, key_hash, time.time() + ttl, key, value)
+            elif found:
+                # the item outgrew its slot, the copy cached before is stale
+                self._write_slot(offset, 0, 0.0, b"", b"")
+
+    def delete(self, key):
+        key = key.encode("utf-8")
+        key_hash = self._hash(key)
+        with self._file_lock():
+            offset, found = self._find_slot(key, key_hash)
+            if found:
+                self._write_slot(offset, 0, 0.0, b"", b"")
+
+    def clear(self):
+        with self._file_lock():
+            for slot in range(self.slots):
+                offset = FILE_HEADER.size + slot * self.slot_size
+                if SLOT_HEADER.unpack_from(self._map, offset)[1]:
+                    self._write_slot(offset, 0, 0.0, b"", b"")
+
+    def close(self):
+        self._map.close()
+        os.close(self._fd)
+        if self._lock_file is not None and self._lock_file[0] == os.getpid():
+            os.close(self._lock_file[1])
+        self._lock_file = None
@@ -0,0 +1,185 @@
+import asyncio
+import json
+import re
+
+import graphene
+from graphene import Node
+
+from .models import Article, Reporter
+from ..fields import PynamoConnectionField
+from ..registry import Registry
+from ..types import PynamoObjectType
+
+
+class Info(object):
+    """Stands for the ResolveInfo of a request, only its context is read"""
+
+    def __init__(self, context=None):
+        self.context = context
+
+
+class FakeResultIterator(list):
+    """Items of a read, with the last_evaluated_key of a pynamodb ResultIterator"""
+
+    def __init__(self, items, last_evaluated_key=None):
+        super(FakeResultIterator, self).__init__(items)
+        self.last_evaluated_key = last_evaluated_key
+
+
+class ExhaustibleIterator(object):
+    """Yields articles like a pynamodb ResultIterator and records how many were pulled."""
+
+    def __init__(self, count, limit=None):
+        self.count = count
+        self.limit = limit
+        self.pulled = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.pulled in (self.count, self.limit):
+            raise StopIteration
+        self.pulled += 1
+        return Article(self.pulled, headline='Article %d' % self.pulled)
+
+    @property
+    def last_evaluated_key(self):
+        if self.pulled == self.count:
+            return None
+        return {'id': {'N': str(self.pulled)}}
+
+
+def make_node_type(model, **meta):
+    """A relay node type for model in its own registry, meta adds to its Meta options"""
+    meta.setdefault('registry', Registry())
+    meta.update(model=model, interfaces=(Node,))
+    return type(model.__name__ + 'Node', (PynamoObjectType,), {'Meta': type('Meta', (), meta)})
+
+
+def make_connection_schema(node_type, name=None, **field_kwargs):
+    """A schema with a root connection of node_type, named after its model unless name is given"""
+    name = name or node_type._meta.model.__name__.lower() + 's'
+    query = type('Query', (graphene.ObjectType,), {name: PynamoConnectionField(node_type, **field_kwargs)})
+    return graphene.Schema(query=query)
+
+
+class DynamoStandIn(object):
+    """A local stand-in for DynamoDB on an asyncio server, serving GetItem, BatchGetItem, Query and Scan.
+
+    tables maps table names to their key attribute names and raw items. Query only honours the hash key condition.
+    unprocessed lists the keys the next BatchGetItem leaves unprocessed, requests records (operation, params) and
+    max_in_flight how many requests were answered at once, each one taking delay seconds.
+    """
+
+    def __init__(self, tables, delay=0):
+        self.tables = tables
+        self.delay = delay
+        self.unprocessed = []
+        self.requests = []
+        self.in_flight = self.max_in_flight = 0
+        self.server = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle, '127.0.0.1', 0)
+        return 'http://127.0.0.1:%d' % self.server.sockets[0].getsockname()[1]
+
+    async def handle(self, reader, writer):
+        while True:
+            request_line = await reader.readline()
+            if not request_line:
+                break
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line == b'\r\n':
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                headers[name.strip().lower()] = value.strip()
+            params = json.loads(await reader.readexactly(int(headers['content-length'])))
+            operation = headers['x-amz-target'].split('.')[1]
+            assert headers['authorization'].startswith('AWS4-HMAC-SHA256')
+            self.requests.append((operation, params))
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            await asyncio.sleep(self.delay)
+            self.in_flight -= 1
+            status, data = getattr(self, operation)(params)
+            body = json.dumps(data).encode('utf-8')
+            writer.write(b'HTTP/1.1 %d OK\r\nContent-Length: %d\r\n\r\n' % (status, len(body)) + body)
+            await writer.drain()
+        writer.close()
+
+    def key_of(self, table, item):
+        return tuple(json.dumps(item[name], sort_keys=True) for name in self.tables[table]['keys'])
+
+    def GetItem(self, params):
+        table = self.tables[params['TableName']]
+        key = self.key_of(params['TableName'], params['Key'])
+        item = next((item for item in table['items'] if self.key_of(params['TableName'], item) == key), None)
+        return 200, {'Item': item} if item else {}
+
+    def BatchGetItem(self, params):
+        responses, unprocessed = {}, {}
+        for name, request in params['RequestItems'].items():
+            for key in request['Keys']:
+                if key in self.unprocessed:
+                    self.unprocessed.remove(key)
+                    unprocessed.setdefault(name, {'Keys': []})['Keys'].append(key)
+                    continue
+                item = self.GetItem({'TableName': name, 'Key': key})[1].get('Item')
+                if item:
+                    responses.setdefault(name, []).append(item)
+        return 200, {'Responses': responses, 'UnprocessedKeys': unprocessed}
+
+    def Scan(self, params, items=None):
+        if params['TableName'] not in self.tables:
+            return 400, {'__type': 'com.amazonaws.dynamodb.v20120810#ResourceNotFoundException',
+                         'message': 'Requested resource not found'}
+        items = self.tables[params['TableName']]['items'] if items is None else items
+        if 'ExclusiveStartKey' in params:
+            start = self.key_of(params['TableName'], params['ExclusiveStartKey'])
+            keys = [self.key_of(params['TableName'], item) for item in items]
+            items = items[keys.index(start) + 1:]
+        data = {'Items': items[:params.get('Limit')]}
+        if len(items) > len(data['Items']):
+            data['LastEvaluatedKey'] = dict(
+                (name, data['Items'][-1][name]) for name in self.tables[params['TableName']]['keys'])
+        return 200, data
+
+    def Query(self, params):
+        hash_key_name = self.tables[params['TableName']]['keys'][0]
+        placeholder = next(placeholder for placeholder, name in params['ExpressionAttributeNames'].items()
+                           if name == hash_key_name)
+        value = re.search(r'%s = (:\w+)' % placeholder, params['KeyConditionExpression']).group(1)
+        hash_key = params['ExpressionAttributeValues'][value]
+        items = [item for item in self.tables[params['TableName']]['items'] if item[hash_key_name] == hash_key]
+        return self.Scan(params, items)
+
+
+def raw_article(id):
+    return {'id': {'N': str(id)}, 'headline': {'S': 'Article %d' % id}}
+
+
+def raw_reporter(id):
+    return {'id': {'N': str(id)}, 'first_name': {'S': 'Reporter %d' % id}, 'favorite_article': {'S': str(id + 100)}}
+
+
+def make_dispatch(calls, unprocessed=()):
+    """Connection.dispatch answering BatchGetItem from raw_article and raw_reporter, once with unprocessed keys"""
+    raw_items = {Article.Meta.table_name: raw_article, Reporter.Meta.table_name: raw_reporter}
+    unprocessed = list(unprocessed)
+
+    def dispatch(operation_name, operation_kwargs, *args):
+        calls.append(operation_kwargs['RequestItems'])
+        responses, unprocessed_keys = {}, {}
+        for table_name, request in operation_kwargs['RequestItems'].items():
+            for key in request['Keys']:
+                if key in unprocessed:
+                    unprocessed.remove(key)
+                    unprocessed_keys.setdefault(table_name, dict(request, Keys=[]))['Keys'].append(key)
+                else:
+                    responses.setdefault(table_name, []).append(raw_items[table_name](int(key['id']['N'])))
+        return {'Responses': responses, 'UnprocessedKeys': unprocessed_keys}
+
+    return dispatch
@@ -5,6 +5,7 @@ from datetime import datetime
 
 from pynamodb.attributes import (NumberAttribute, NumberSetAttribute, UnicodeAttribute, UTCDateTimeAttribute,
                                  MapAttribute, ListAttribute)
+from pynamodb.indexes import AllProjection, GlobalSecondaryIndex, KeysOnlyProjection, LocalSecondaryIndex
 from pynamodb.models import Model
 
 from graphene_pynamodb.relationships import OneToOne, OneToMany
@@ -61,3 +62,51 @@ class Reporter(Model):
     favorite_article = OneToOne(Article, null=True)
     custom_map = MapAttribute(null=True)
     awards = ListAttribute(null=True)
+
+
+class AuthorIndex(GlobalSecondaryIndex):
+    class Meta:
+        index_name = 'author-index'
+        read_capacity_units = 1
+        write_capacity_units = 1
+        projection = AllProjection()
+
+    author = UnicodeAttribute(hash_key=True)
+    published = NumberAttribute(range_key=True)
+
+
+class TitleIndex(GlobalSecondaryIndex):
+    class Meta:
+        index_name = 'title-index'
+        read_capacity_units = 1
+        write_capacity_units = 1
+        projection = KeysOnlyProjection()
+
+    title = UnicodeAttribute(hash_key=True)
+
+
+class ChapterIndex(LocalSecondaryIndex):
+    class Meta:
+        index_name = 'chapter-index'
+        projection = AllProjection()
+
+    book = UnicodeAttribute(hash_key=True)
+    chapter_title = UnicodeAttribute(range_key=True)
+
+
+class Chapter(Model):
+    class Meta:
+        table_name = 'test_graphene_pynamodb_chapters'
+        host = DB_HOST
+        region = DB_REGION
+
+    book = UnicodeAttribute(hash_key=True)
+    number = NumberAttribute(range_key=True)
+    chapter_title = UnicodeAttribute()
+    title = UnicodeAttribute()
+    author = UnicodeAttribute()
+    published = NumberAttribute()
+
+    author_index = AuthorIndex()
+    title_index = TitleIndex()
+    chapter_index = ChapterIndex()
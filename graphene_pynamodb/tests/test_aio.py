@@ -0,0 +1,175 @@
+import asyncio
+import json
+
+import graphene
+from botocore.credentials import Credentials, RefreshableCredentials
+from botocore.exceptions import ClientError
+from graphene import Node
+from graphql.execution.executors.asyncio import AsyncioExecutor
+from graphql_relay import to_global_id
+from mock import MagicMock, patch
+from pytest import fixture, importorskip, raises
+
+from .helpers import DynamoStandIn, make_node_type
+from .models import Article, Reporter
+from ..aio import AsyncDynamoClient, batch_get_items_async
+from ..fields import PynamoConnectionField, PynamoNodesField
+from ..registry import Registry
+
+importorskip('aiohttp')
+
+
+@fixture
+def loop():
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    yield loop
+    loop.close()
+    asyncio.set_event_loop(None)
+
+
+@fixture
+def stand_in(loop):
+    stand_in = DynamoStandIn({
+        Article.Meta.table_name: {'keys': ['id'], 'items': [
+            {'id': {'N': str(id)}, 'headline': {'S': 'Article %d' % id}, 'reporter': {'S': str(id % 2 + 1)}}
+            for id in range(1, 5)
+        ]},
+        Reporter.Meta.table_name: {'keys': ['id'], 'items': [
+            {'id': {'N': '1'}, 'first_name': {'S': 'John'}, 'last_name': {'S': 'Doe'},
+             'articles': {'L': [{'N': '4'}, {'N': '2'}, {'N': '9'}]}},
+            {'id': {'N': '2'}, 'first_name': {'S': 'Jane'}, 'last_name': {'S': 'Roe'}},
+        ]},
+    })
+    host = loop.run_until_complete(stand_in.start())
+    stand_in.client = AsyncDynamoClient(region='us-west-2', host=host, credentials=Credentials('key', 'secret'))
+    yield stand_in
+    loop.run_until_complete(stand_in.client.close())
+    stand_in.server.close()
+
+
+def setup_schema():
+    registry = Registry()
+    reporter_type = make_node_type(Reporter, registry=registry, exclude_fields=('custom_map',))
+    article_type = make_node_type(Article, registry=registry)
+
+    class Query(graphene.ObjectType):
+        node = Node.Field()
+        nodes = PynamoNodesField()
+        articles = PynamoConnectionField(article_type)
+        more_articles = PynamoConnectionField(article_type)
+
+    return graphene.Schema(query=Query, types=[reporter_type])
+
+
+def execute(loop, stand_in, query):
+    return setup_schema().execute(
+        query, executor=AsyncioExecutor(loop), context_value={'pynamodb_async_client': stand_in.client})
+
+
+def test_connection_should_read_on_the_event_loop(loop, stand_in):
+    query = '''{ articles(first: 3) {
+        edges { node { headline reporter { firstName } } }
+        pageInfo { hasNextPage }
+    } }'''
+    result = execute(loop, stand_in, query)
+    assert not result.errors
+    assert [edge['node'] for edge in result.data['articles']['edges']] == [
+        {'headline': 'Article 1', 'reporter': {'firstName': 'Jane'}},
+        {'headline': 'Article 2', 'reporter': {'firstName': 'John'}},
+        {'headline': 'Article 3', 'reporter': {'firstName': 'Jane'}},
+    ]
+    assert result.data['articles']['pageInfo']['hasNextPage']
+    # the reporters of the page come back from one batch_get
+    assert [operation for operation, _ in stand_in.requests] == ['Scan', 'BatchGetItem']
+    assert stand_in.requests[0][1]['Limit'] == 3
+
+
+def test_sibling_connections_should_read_concurrently(loop, stand_in):
+    stand_in.delay = 0.05
+    result = execute(loop, stand_in, '''{
+        articles(first: 1) { edges { node { headline } } }
+        moreArticles(first: 1) { edges { node { headline } } }
+    }''')
+    assert not result.errors
+    assert stand_in.max_in_flight == 2
+
+
+def test_connection_should_count_off_the_loop_only_when_selected(loop, stand_in):
+    strategy = MagicMock(return_value=4)
+    schema = graphene.Schema(query=type('Query', (graphene.ObjectType,), {
+        'articles': PynamoConnectionField(make_node_type(Article), count_strategy=strategy)}))
+    context = {'pynamodb_async_client': stand_in.client}
+    with patch.object(loop, 'run_in_executor', wraps=loop.run_in_executor) as run_in_executor:
+        result = schema.execute('{ articles(first: 1) { edges { node { headline } } } }',
+                                executor=AsyncioExecutor(loop), context_value=context)
+        assert not result.errors
+        run_in_executor.assert_not_called()
+
+        result = schema.execute('{ articles(first: 1) { totalCount } }',
+                                executor=AsyncioExecutor(loop), context_value=context)
+    assert not result.errors
+    assert result.data['articles']['totalCount'] == 4
+    run_in_executor.assert_called_once()
+    strategy.assert_called_once()
+
+
+def test_node_should_read_on_the_event_loop(loop, stand_in):
+    query = '{ node(id: "%s") { ... on ArticleNode { headline } } }' % to_global_id('ArticleNode', 2)
+    result = execute(loop, stand_in, query)
+    assert not result.errors
+    assert result.data['node'] == {'headline': 'Article 2'}
+    assert stand_in.requests[0][0] == 'GetItem'
+
+
+def test_nodes_should_read_concurrently_on_the_event_loop(loop, stand_in):
+    stand_in.delay = 0.05
+    ids = [to_global_id('ReporterNode', 2), to_global_id('ArticleNode', 3), to_global_id('ArticleNode', 9)]
+    query = '{ nodes(ids: %s) { ... on ArticleNode { headline } ... on ReporterNode { firstName } } }' % (
+        json.dumps(ids))
+    result = execute(loop, stand_in, query)
+    assert not result.errors
+    assert result.data['nodes'] == [{'firstName': 'Jane'}, {'headline': 'Article 3'}, None]
+    assert [operation for operation, _ in stand_in.requests] == ['BatchGetItem', 'BatchGetItem']
+    assert stand_in.max_in_flight == 2
+
+
+def test_relationship_connection_should_read_its_page_on_the_event_loop(loop, stand_in):
+    query = '{ node(id: "%s") { ... on ReporterNode { articles(first: 2) { edges { node { headline } } } } } }' % (
+        to_global_id('ReporterNode', 1))
+    result = execute(loop, stand_in, query)
+    assert not result.errors
+    assert [edge['node']['headline'] for edge in result.data['node']['articles']['edges']] == [
+        'Article 4', 'Article 2']
+    assert [operation for operation, _ in stand_in.requests] == ['GetItem', 'BatchGetItem']
+    assert len(stand_in.requests[1][1]['RequestItems'][Article.Meta.table_name]['Keys']) == 2
+
+
+def test_batch_get_items_async_should_retry_unprocessed_keys(loop, stand_in):
+    stand_in.unprocessed = [{'id': {'N': '2'}}]
+    items = loop.run_until_complete(
+        batch_get_items_async(stand_in.client, Reporter, [1, 2], base_backoff=0.001))
+    assert sorted(items) == [1, 2]
+    assert [operation for operation, _ in stand_in.requests] == ['BatchGetItem', 'BatchGetItem']
+
+
+def test_client_should_raise_client_errors(loop, stand_in):
+    with raises(ClientError) as error:
+        loop.run_until_complete(stand_in.client.call('Scan', {'TableName': 'missing'}))
+    assert error.value.response['Error']['Code'] == 'ResourceNotFoundException'
+
+
+def test_client_should_refresh_credentials_off_the_loop(loop, stand_in):
+    stand_in.client.credentials = RefreshableCredentials.create_from_metadata(
+        {'access_key': 'key', 'secret_key': 'secret', 'token': None, 'expiry_time': '2000-01-01T00:00:00Z'},
+        refresh_using=lambda: {'access_key': 'key', 'secret_key': 'secret', 'token': None,
+                               'expiry_time': '2100-01-01T00:00:00Z'},
+        method='test')
+    with patch.object(loop, 'run_in_executor', wraps=loop.run_in_executor) as run_in_executor:
+        loop.run_until_complete(stand_in.client.call('GetItem', {
+            'TableName': Article.Meta.table_name, 'Key': {'id': {'N': '1'}}}))
+        loop.run_until_complete(stand_in.client.call('GetItem', {
+            'TableName': Article.Meta.table_name, 'Key': {'id': {'N': '2'}}}))
+    # only the expired credentials were refreshed, once
+    run_in_executor.assert_called_once()
+    assert [operation for operation, _ in stand_in.requests] == ['GetItem', 'GetItem']
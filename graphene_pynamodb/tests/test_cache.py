@@ -0,0 +1,188 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from mock import MagicMock, patch
+
+from .helpers import Info
+from .models import Article, Chapter, Reporter
+from ..cache import (NOT_FOUND, CacheInvalidationMixin, IdentityMap, LRUCache, SingleFlight, cache_item,
+                     get_cached_item, get_identity_map, get_item, set_item_cache)
+from ..loaders import batch_get_items
+from ..relationships import RelationshipResult
+
+
+def test_identity_map_should_be_request_scoped():
+    info = Info({})
+    identity_map = get_identity_map(info)
+    assert isinstance(identity_map, IdentityMap)
+    assert get_identity_map(info) is identity_map
+    assert get_identity_map(Info({})) is not identity_map
+    assert get_identity_map(Info(None)) is None
+
+
+def test_identity_map_should_serve_covered_projections():
+    identity_map = IdentityMap()
+    article = Article(1, headline='Hi!')
+    assert identity_map.add(article, ['headline', 'id']) is article
+
+    assert identity_map.get(Article, 1, ['id']) is article
+    assert identity_map.get(Article, 1, ['id', 'reporter']) is None
+    assert identity_map.get(Article, 1) is None
+    assert identity_map.get(Article, 2, ['id']) is None
+
+    # the whole item replaces the projected one, a narrower one does not
+    full = Article(1, headline='Hi!')
+    assert identity_map.add(full) is full
+    assert identity_map.add(Article(1), ['id']) is full
+    assert identity_map.get(Article, 1) is full
+
+
+def test_identity_map_should_merge_disjoint_projections():
+    identity_map = IdentityMap()
+    reporter = identity_map.add(Reporter(1, first_name='John'), ['first_name', 'id'])
+
+    raw = {'id': {'N': '1'}, 'email': {'S': 'john@example.com'}}
+    with patch.object(Reporter, '_batch_get_page', return_value=([raw], None)):
+        items = batch_get_items(Reporter, [1], attributes_to_get=['email', 'id'], identity_map=identity_map)
+    assert items[1] is reporter
+    assert (reporter.first_name, reporter.email) == ('John', 'john@example.com')
+    assert identity_map.get(Reporter, 1, ['email', 'first_name']) is reporter
+
+
+def test_identity_map_should_key_range_keys():
+    identity_map = IdentityMap()
+    chapter = Chapter('dune', 1)
+    identity_map.add(chapter)
+    assert identity_map.get(Chapter, ('dune', 1)) is chapter
+    assert identity_map.get(Chapter, ('dune', 2)) is None
+
+
+def test_reads_should_share_the_identity_map():
+    identity_map = IdentityMap()
+    article = identity_map.add(Article(1, headline='Hi!'))
+
+    with patch.object(Article, '_batch_get_page', return_value=([{'id': {'N': '2'}}], None)) as batch_get_page:
+        items = batch_get_items(Article, [1, 2], identity_map=identity_map)
+    assert batch_get_page.call_args[0][0] == [{'id': '2'}]
+    assert items[1] is article
+    assert identity_map.get(Article, 2) is items[2]
+
+    with patch.object(Article, 'get', MagicMock()) as get:
+        relationship = RelationshipResult('id', 1, Article)
+        relationship._self_identity_map = identity_map
+        assert relationship.headline == 'Hi!'
+    get.assert_not_called()
+
+
+@pytest.fixture
+def item_cache():
+    backend = LRUCache()
+    set_item_cache(backend)
+    with patch.object(Article.Meta, 'cache_ttl', 60, create=True):
+        yield backend
+    set_item_cache(None)
+
+
+def test_lru_cache_should_expire_and_evict():
+    cache = LRUCache(max_size=2)
+    cache.set('a', {'id': 1}, 60)
+    cache.set('b', {'id': 2}, 60)
+    assert cache.get('a') == {'id': 1}
+    cache.set('c', {'id': 3}, 60)
+    # b was the least recently used
+    assert cache.get('b') is None
+    assert len(cache) == 2
+
+    cache.set('a', {'id': 1}, 0)
+    assert cache.get('a') is None
+
+
+def test_get_item_should_cache_whole_items(item_cache):
+    with patch.object(Article, 'get', return_value=Article(1, headline='Hi!')) as get:
+        assert get_item(Article, 1, attributes_to_get=['id']).headline == 'Hi!'
+        assert get_item(Article, 1).headline == 'Hi!'
+    get.assert_called_once_with(1)
+
+    # consistent reads go to the table and refresh the cache
+    with patch.object(Article, 'get', return_value=Article(1, headline='Bye!')) as get:
+        assert get_item(Article, 1, consistent_read=True).headline == 'Bye!'
+    assert get_item(Article, 1).headline == 'Bye!'
+
+    # models without a cache_ttl are not cached
+    with patch.object(Chapter, 'get', return_value=Chapter('dune', 1)) as get:
+        get_item(Chapter, ('dune', 1), attributes_to_get=['book'])
+        get_item(Chapter, ('dune', 1))
+    assert get.call_count == 2
+    get.assert_called_with('dune', 1)
+
+
+def test_get_item_should_cache_missing_items(item_cache):
+    with patch.object(Article, 'get', side_effect=Article.DoesNotExist()) as get:
+        for _ in range(2):
+            with pytest.raises(Article.DoesNotExist):
+                get_item(Article, 1)
+    get.assert_called_once_with(1)
+
+    with patch.object(Article, '_batch_get_page', MagicMock()) as batch_get_page:
+        assert batch_get_items(Article, [1]) == {}
+    batch_get_page.assert_not_called()
+
+
+def test_batch_get_items_should_use_the_item_cache(item_cache):
+    cache_item(Article, 1, Article(1, headline='Hi!'))
+    with patch.object(Article, '_batch_get_page', return_value=([{'id': {'N': '2'}}], None)) as batch_get_page:
+        items = batch_get_items(Article, [1, 2, 3], attributes_to_get=['id'])
+    assert batch_get_page.call_args[0][0] == [{'id': '2'}, {'id': '3'}]
+    assert batch_get_page.call_args[1]['attributes_to_get'] is None
+    assert items[1].headline == 'Hi!' and 3 not in items
+    assert get_cached_item(Article, 2).id == 2
+    assert get_cached_item(Article, 3) is NOT_FOUND
+
+
+def test_writes_should_invalidate_the_item_cache(item_cache):
+    class CachedArticle(CacheInvalidationMixin, Article):
+        class Meta(Article.Meta):
+            cache_ttl = 60
+
+    article = CachedArticle(1, headline='Hi!')
+    cache_item(CachedArticle, 1, article)
+    with patch.object(Article, 'save', return_value={}) as save:
+        article.save()
+    save.assert_called_once_with()
+    assert get_cached_item(CachedArticle, 1) is None
+
+
+def test_concurrent_reads_should_share_one_call():
+    flight = SingleFlight()
+    started = threading.Event()
+
+    def read(*args, **kwargs):
+        started.set()
+        # wait for the other readers to join the call in flight
+        deadline = time.monotonic() + 5
+        while flight.coalesced < 4 and time.monotonic() < deadline:
+            time.sleep(0.001)
+        return Article(1, headline='Hi!')
+
+    get = MagicMock(side_effect=read)
+    with patch('graphene_pynamodb.cache.single_flight', flight), patch.object(Article, 'get', get):
+        with ThreadPoolExecutor(max_workers=5) as pool:
+            leader = pool.submit(get_item, Article, 1, attributes_to_get=['headline', 'id'])
+            assert started.wait(5)
+            followers = [pool.submit(get_item, Article, 1, attributes_to_get=['id', 'headline']) for _ in range(4)]
+            items = [leader.result()] + [follower.result() for follower in followers]
+
+    get.assert_called_once_with(1, attributes_to_get=['headline', 'id'])
+    assert flight.coalesced == 4
+    assert [item.headline for item in items] == ['Hi!'] * 5
+    assert len(set(id(item) for item in items)) == 5
+
+
+def test_single_flight_should_share_errors():
+    flight = SingleFlight()
+    with pytest.raises(Article.DoesNotExist):
+        flight.do('key', MagicMock(side_effect=Article.DoesNotExist()))
+    # the failed call is not in flight anymore
+    assert flight.do('key', lambda: 1) == (1, False)
@@ -0,0 +1,46 @@
+from .helpers import Info, make_node_type
+from .models import Article, Reporter
+from ..consistency import RecentWritesPolicy, get_consistent_read
+
+
+def make_type(**meta):
+    return make_node_type(Article, **meta)
+
+
+def test_consistent_read_should_default_to_eventual():
+    assert get_consistent_read(make_type(), Info()) is False
+    assert get_consistent_read(make_type(), None) is False
+
+
+def test_consistent_read_should_prefer_context_then_field_then_meta():
+    strong = make_type(consistent_read=True)
+    assert get_consistent_read(strong, Info()) is True
+    assert get_consistent_read(strong, Info(), field_policy=False) is False
+    assert get_consistent_read(strong, Info({'consistent_read': False}), field_policy=True) is False
+    assert get_consistent_read(make_type(), Info({'consistent_read': True})) is True
+
+
+def test_consistent_read_should_skip_undecided_policies():
+    calls = []
+
+    def policy(model, info, key):
+        calls.append((model, key))
+        return None
+
+    assert get_consistent_read(make_type(consistent_read=True), Info({'consistent_read': policy}), key=1) is True
+    assert calls == [(Article, 1)]
+
+
+def test_recent_writes_should_read_your_writes():
+    policy = RecentWritesPolicy(window=60)
+    assert policy(Article, None, 1) is None
+
+    policy.record(Article(1))
+    assert policy(Article, None, 1) is True
+    assert policy(Article, None, 2) is None
+    # list reads of the model see the write too
+    assert policy(Article, None) is True
+    assert policy(Reporter, None) is None
+
+    policy.window = 0
+    assert policy(Article, None, 1) is None
@@ -0,0 +1,79 @@
+import graphene
+from mock import MagicMock, patch
+
+from .helpers import ExhaustibleIterator, make_connection_schema, make_node_type
+from .models import Article, Reporter
+from ..counting import ScanCount, TableItemCount, scan_count
+from ..planner import BATCH_GET, SCAN, QueryPlan
+from ..registry import Registry
+from ..relationships import RelationshipResultList
+
+
+def test_scan_count_should_select_count_across_pages():
+    calls = []
+
+    def dispatch(operation_name, operation_kwargs, *args):
+        calls.append((operation_name, dict(operation_kwargs)))
+        if 'ExclusiveStartKey' in operation_kwargs:
+            return {'Count': 2, 'ScannedCount': 5}
+        return {'Count': 3, 'ScannedCount': 5, 'LastEvaluatedKey': {'id': {'N': '5'}}}
+
+    with patch('pynamodb.connection.base.Connection.dispatch', side_effect=dispatch):
+        assert scan_count(Article, Article.headline.startswith('Hi')) == 5
+    assert [operation for operation, _ in calls] == ['Scan', 'Scan']
+    assert calls[0][1]['Select'] == 'COUNT'
+    assert calls[0][1]['FilterExpression'] == 'begins_with (#0, :0)'
+    assert calls[0][1]['ExpressionAttributeNames'] == {'#0': 'headline'}
+    assert calls[1][1]['ExclusiveStartKey'] == {'id': {'N': '5'}}
+
+
+def test_scan_count_should_count_batch_gets_by_their_items():
+    with patch('graphene_pynamodb.counting.batch_get_items', return_value={1: None, 3: None}) as batch_get:
+        assert ScanCount()(QueryPlan(Article, BATCH_GET, keys=[1, 2, 3]), None) == 2
+    assert batch_get.call_args[1]['attributes_to_get'] == ['id']
+
+
+def test_table_item_count_should_estimate_whole_tables_only():
+    fallback = MagicMock(return_value=7)
+    strategy = TableItemCount(fallback=fallback)
+    with patch.object(Article, 'describe_table', return_value={'ItemCount': 42}) as describe_table:
+        assert strategy(QueryPlan(Article, SCAN), None) == 42
+        assert strategy(QueryPlan(Article, SCAN), None) == 42
+        assert strategy(QueryPlan(Article, SCAN, filter_condition=Article.headline == 'Hi'), None) == 7
+    # counts are kept for their ttl
+    describe_table.assert_called_once_with()
+    fallback.assert_called_once()
+
+
+def test_connection_should_count_only_when_total_count_is_selected():
+    strategy = MagicMock(return_value=100)
+    schema = make_connection_schema(make_node_type(Article), count_strategy=strategy)
+    with patch.object(Article, 'scan', return_value=ExhaustibleIterator(100, limit=2)):
+        result = schema.execute('{ articles(first: 2) { edges { node { headline } } } }')
+    assert not result.errors
+    strategy.assert_not_called()
+
+    with patch.object(Article, 'scan', return_value=ExhaustibleIterator(100, limit=2)):
+        result = schema.execute('{ articles(first: 2) { totalCount edges { node { headline } } } }')
+    assert not result.errors
+    assert result.data['articles']['totalCount'] == 100
+    assert isinstance(strategy.call_args[0][0], QueryPlan)
+
+
+def test_relationship_total_count_should_come_from_its_keys():
+    registry = Registry()
+    reporter_type = make_node_type(Reporter, registry=registry, exclude_fields=('custom_map',))
+    make_node_type(Article, registry=registry)
+
+    class Query(graphene.ObjectType):
+        reporter = graphene.Field(reporter_type)
+
+        def resolve_reporter(self, info):
+            return Reporter(1, articles=RelationshipResultList('id', Article, [4, 2, 9]))
+
+    schema = graphene.Schema(query=Query)
+    with patch('graphene_pynamodb.relationships.batch_get_items', return_value={}) as batch_get:
+        result = schema.execute('{ reporter { articles(first: 1) { totalCount } } }', context_value={})
+    assert not result.errors
+    assert result.data['reporter']['articles']['totalCount'] == 3
+    batch_get.assert_not_called()
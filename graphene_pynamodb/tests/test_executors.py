@@ -0,0 +1,90 @@
+import threading
+
+import graphene
+from mock import patch
+
+from .helpers import FakeResultIterator, make_node_type
+from .models import Article, Reporter
+from ..executors import PynamoThreadExecutor, share_connection_pool
+from ..fields import PynamoConnectionField
+from ..registry import Registry
+from ..relationships import RelationshipResult
+
+
+def setup_schema():
+    registry = Registry()
+    reporter_type = make_node_type(Reporter, registry=registry, exclude_fields=('custom_map',))
+    article_type = make_node_type(Article, registry=registry)
+    articles = [
+        Article(id, headline='Article %d' % id, reporter=RelationshipResult('id', reporter_id, Reporter))
+        for id, reporter_id in ((1, 1), (2, 2), (3, 1))
+    ]
+
+    class Query(graphene.ObjectType):
+        articles = PynamoConnectionField(article_type)
+        reporters = PynamoConnectionField(reporter_type)
+        article_list = graphene.List(article_type)
+
+        def resolve_article_list(self, info):
+            return articles
+
+    return graphene.Schema(query=Query)
+
+
+def test_executor_should_read_root_fields_concurrently():
+    # each scan waits for the other one, they only return when both run at once
+    both_running = threading.Barrier(2, timeout=5)
+
+    def scan(**kwargs):
+        both_running.wait()
+        return FakeResultIterator([])
+
+    query = '{ articles(first: 1) { edges { node { headline } } } reporters(first: 1) { edges { node { id } } } }'
+    with patch.object(Article, 'scan', side_effect=scan), patch.object(Reporter, 'scan', side_effect=scan):
+        result = setup_schema().execute(query, executor=PynamoThreadExecutor(max_workers=4), context_value={})
+    assert not result.errors
+    assert result.data == {'articles': {'edges': []}, 'reporters': {'edges': []}}
+
+
+def test_executor_should_batch_relationships_on_the_pool():
+    threads = []
+
+    def batch_get_tables(requests, **kwargs):
+        threads.append(threading.current_thread())
+        return dict((model, dict((key, model(key, first_name='Reporter %d' % key)) for key in keys))
+                    for model, (keys, _, _) in requests.items())
+
+    with patch('graphene_pynamodb.loaders.batch_get_tables', side_effect=batch_get_tables) as batch_get:
+        result = setup_schema().execute(
+            '{ articleList { headline reporter { firstName } } }',
+            executor=PynamoThreadExecutor(max_workers=4), context_value={},
+        )
+    assert not result.errors
+    assert [article['reporter']['firstName'] for article in result.data['articleList']] == [
+        'Reporter 1', 'Reporter 2', 'Reporter 1']
+    assert batch_get.call_count == 1
+    assert threads[0] is not threading.main_thread()
+
+
+def test_executor_should_resolve_scalars_inline():
+    executor = PynamoThreadExecutor(max_workers=1)
+    with patch.object(executor, 'submit', wraps=executor.submit) as submit:
+        result = setup_schema().execute('{ articleList { headline } }', executor=executor)
+    assert not result.errors
+    assert submit.call_count == 1
+
+
+def test_models_should_share_a_sized_connection_pool(monkeypatch):
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'key')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'secret')
+    pool_sizes = Article.Meta.max_pool_connections, Reporter.Meta.max_pool_connections
+    try:
+        clients = share_connection_pool([Article, Reporter], max_connections=4)
+        client = Article._get_connection().connection.client
+        assert list(clients.values()) == [client]
+        assert Reporter._get_connection().connection.client is client
+        assert client.meta.config.max_pool_connections == 4
+    finally:
+        for model, pool_size in zip((Article, Reporter), pool_sizes):
+            model.Meta.max_pool_connections = pool_size
+            model._connection = None
@@ -0,0 +1,275 @@
+import graphene
+from graphql_relay import to_global_id
+from mock import patch
+
+from .helpers import (ExhaustibleIterator, FakeResultIterator, Info, make_connection_schema, make_dispatch,
+                      make_node_type)
+from .models import Article, Chapter, Reporter
+from ..cache import get_identity_map
+from ..fields import PynamoConnectionField, PynamoNodesField
+from ..keys import get_key_codec
+from ..planner import QueryPlan
+from ..registry import Registry
+from ..relationships import RelationshipResultList
+from ..utils import to_cursor
+
+
+def setup_schema(**field_kwargs):
+    return make_connection_schema(make_node_type(Article), **field_kwargs)
+
+
+def test_connection_should_stream_result_iterator():
+    schema = setup_schema()
+    results = ExhaustibleIterator(100, limit=2)
+    query = '{ articles(first: 2) { edges { node { headline } } pageInfo { hasNextPage endCursor } } }'
+    with patch.object(Article, 'scan', return_value=results) as scan:
+        result = schema.execute(query)
+    assert not result.errors
+    assert scan.call_args[1]['limit'] == 2
+    assert scan.call_args[1]['attributes_to_get'] == ['headline', 'id']
+    assert results.pulled == 2
+    assert [edge['node']['headline'] for edge in result.data['articles']['edges']] == ['Article 1', 'Article 2']
+    assert result.data['articles']['pageInfo']['hasNextPage']
+
+
+def test_connection_should_page_from_last_evaluated_key():
+    schema = setup_schema()
+    query = '{ articles(first: 2) { pageInfo { hasNextPage endCursor } } }'
+    with patch.object(Article, 'scan', return_value=ExhaustibleIterator(2, limit=2)):
+        result = schema.execute(query)
+    assert not result.errors
+    assert not result.data['articles']['pageInfo']['hasNextPage']
+
+    with patch.object(Article, 'scan', return_value=ExhaustibleIterator(3, limit=2)):
+        result = schema.execute(query)
+    assert result.data['articles']['pageInfo']['hasNextPage']
+
+    after = result.data['articles']['pageInfo']['endCursor']
+    with patch.object(Article, 'scan', return_value=ExhaustibleIterator(0)) as scan:
+        result = schema.execute('{ articles(first: 2, after: "%s") { pageInfo { hasNextPage } } }' % after)
+    assert not result.errors
+    assert scan.call_args[1]['last_evaluated_key'] == {'id': {'N': '2'}}
+
+
+def test_connection_should_stream_resolver_generators():
+    results = ExhaustibleIterator(100)
+
+    class Query(graphene.ObjectType):
+        articles = PynamoConnectionField(make_node_type(Article))
+
+        def resolve_articles(self, info, **args):
+            return results
+
+    schema = graphene.Schema(query=Query)
+    result = schema.execute('{ articles(first: 5) { edges { node { headline } } } }')
+    assert not result.errors
+    assert results.pulled == 6
+    assert len(result.data['articles']['edges']) == 5
+
+
+def test_connection_should_page_backwards_on_range_keys():
+    schema = make_connection_schema(make_node_type(Chapter))
+    # the query returns the most recent chapters first
+    last_key = {'book': {'S': 'dune'}, 'number': {'N': '8'}}
+    results = FakeResultIterator([Chapter('dune', 9), Chapter('dune', 8)], last_key)
+    query = '''{ chapters(book: "dune", last: 2) {
+        edges { node { number } }
+        pageInfo { hasNextPage hasPreviousPage startCursor }
+    } }'''
+    with patch.object(Chapter, 'query', return_value=results) as chapter_query:
+        result = schema.execute(query)
+    assert not result.errors
+    assert chapter_query.call_args[1]['scan_index_forward'] is False
+    assert chapter_query.call_args[1]['limit'] == 2
+    assert [edge['node']['number'] for edge in result.data['chapters']['edges']] == [8, 9]
+    page_info = result.data['chapters']['pageInfo']
+    assert page_info['hasPreviousPage'] and not page_info['hasNextPage']
+
+    query = '{ chapters(book: "dune", last: 2, before: "%s") { pageInfo { hasNextPage } } }' % page_info['startCursor']
+    with patch.object(Chapter, 'query', return_value=FakeResultIterator([])) as chapter_query:
+        result = schema.execute(query)
+    assert not result.errors
+    assert chapter_query.call_args[1]['last_evaluated_key'] == last_key
+    assert result.data['chapters']['pageInfo']['hasNextPage']
+
+
+def test_connection_should_bound_backward_pages_by_after():
+    field = PynamoConnectionField(make_node_type(Chapter))
+    after = to_cursor(Chapter('dune', 3))
+    query, params = field.get_query_params(Chapter, None, book='dune', last=2, after=after)
+    assert params['scan_index_forward'] is False
+    assert str(params['range_key_condition']) == str(Chapter.number > 3)
+    with patch.object(Chapter, 'query', return_value=FakeResultIterator([])) as chapter_query:
+        query(**params)
+    assert str(chapter_query.call_args[1]['range_key_condition']) == str(Chapter.number > 3)
+
+    # a range key condition of its own leaves the read no room for the bound, it pages forwards from after
+    query, params = field.get_query_params(Chapter, None, book='dune', number=3, last=2, after=after)
+    assert 'scan_index_forward' not in params
+    assert params['last_evaluated_key'] == {'book': {'S': 'dune'}, 'number': {'N': '3'}}
+
+
+def test_connection_should_read_eventually_consistent_by_default():
+    schema = setup_schema()
+    query = '{ articles(first: 2) { edges { node { headline } } } }'
+    with patch.object(Article, 'scan', return_value=FakeResultIterator([])) as scan:
+        result = schema.execute(query)
+    assert not result.errors
+    assert scan.call_args[1]['consistent_read'] is False
+
+    schema = setup_schema(consistent_read=True)
+    with patch.object(Article, 'scan', return_value=FakeResultIterator([])) as scan:
+        schema.execute(query)
+    assert scan.call_args[1]['consistent_read'] is True
+
+    # the request context overrides the field
+    with patch.object(Article, 'scan', return_value=FakeResultIterator([])) as scan:
+        schema.execute(query, context_value={'consistent_read': False})
+    assert scan.call_args[1]['consistent_read'] is False
+
+
+def test_connection_should_fill_the_identity_map():
+    schema = setup_schema()
+    context = {}
+    article = Article(1, headline='Hi!')
+    with patch.object(Article, 'scan', return_value=FakeResultIterator([article])):
+        result = schema.execute('{ articles(first: 2) { edges { node { headline } } } }', context_value=context)
+    assert not result.errors
+    assert get_identity_map(Info(context)).get(Article, 1, ['headline', 'id']) is article
+
+
+def test_nodes_should_read_in_one_batch_and_keep_order():
+    registry = Registry()
+    types = [make_node_type(Reporter, registry=registry, exclude_fields=('custom_map',)),
+             make_node_type(Article, registry=registry)]
+
+    class Query(graphene.ObjectType):
+        nodes = PynamoNodesField()
+
+    ids = [to_global_id('ArticleNode', 2), to_global_id('ReporterNode', 1), 'not an id', to_global_id('ArticleNode', 7),
+           to_global_id('ArticleNode', 1)]
+    query = '''query ($ids: [ID!]!) { nodes(ids: $ids) {
+        id ... on ArticleNode { headline } ... on ReporterNode { firstName }
+    } }'''
+    calls = []
+    # article 7 is unprocessed once, then missing
+    dispatch = make_dispatch(calls, [{'id': {'N': '7'}}])
+
+    def missing_seven(operation_name, operation_kwargs, *args):
+        data = dispatch(operation_name, operation_kwargs, *args)
+        data['Responses'][Article.Meta.table_name] = [
+            item for item in data['Responses'].get(Article.Meta.table_name, []) if item['id']['N'] != '7']
+        return data
+
+    with patch('pynamodb.connection.base.Connection.dispatch', side_effect=missing_seven), \
+            patch('graphene_pynamodb.loaders.time.sleep'):
+        result = graphene.Schema(query=Query, types=types).execute(
+            query, variable_values={'ids': ids}, context_value={})
+    assert not result.errors
+    assert result.data['nodes'] == [
+        {'id': ids[0], 'headline': 'Article 2'}, {'id': ids[1], 'firstName': 'Reporter 1'}, None, None,
+        {'id': ids[4], 'headline': 'Article 1'},
+    ]
+    assert len(calls) == 2
+    assert calls[0][Article.Meta.table_name]['ExpressionAttributeNames'] == {'#0': 'headline', '#1': 'id'}
+    assert len(calls[0][Reporter.Meta.table_name]['Keys']) == 1
+
+
+def test_nodes_should_resolve_malformed_ids_to_null():
+    class Query(graphene.ObjectType):
+        nodes = PynamoNodesField()
+
+    ids = [to_global_id('ArticleNode', 'abc'), to_global_id('ArticleNode', 1)]
+    schema = graphene.Schema(query=Query, types=[make_node_type(Article)])
+    with patch('pynamodb.connection.base.Connection.dispatch', side_effect=make_dispatch([])):
+        result = schema.execute('query ($ids: [ID!]!) { nodes(ids: $ids) { id } }', variable_values={'ids': ids})
+    assert not result.errors
+    assert result.data['nodes'] == [None, {'id': ids[1]}]
+
+
+def test_connection_should_encode_cursors_only_when_selected():
+    schema = setup_schema()
+    with patch.object(QueryPlan, 'cursor_for', return_value='cursor') as cursor_for, \
+            patch('graphene_pynamodb.fields.key_to_cursor', return_value='next') as key_to_cursor:
+        with patch.object(Article, 'scan', return_value=ExhaustibleIterator(100, limit=3)):
+            result = schema.execute('{ articles(first: 3) { edges { node { headline } } pageInfo { hasNextPage } } }')
+        assert not result.errors
+        assert result.data['articles']['pageInfo']['hasNextPage']
+        cursor_for.assert_not_called()
+        key_to_cursor.assert_not_called()
+
+        with patch.object(Article, 'scan', return_value=ExhaustibleIterator(100, limit=3)):
+            result = schema.execute('{ articles(first: 3) { edges { cursor } pageInfo { endCursor } } }')
+        assert not result.errors
+        assert cursor_for.call_count == 3
+        assert result.data['articles']['pageInfo']['endCursor'] == 'next'
+
+
+def test_relationship_connection_should_find_after_cursors_by_position():
+    registry = Registry()
+    reporter_type = make_node_type(Reporter, registry=registry, exclude_fields=('custom_map',))
+    make_node_type(Article, registry=registry)
+    articles = RelationshipResultList('id', Article, list(range(10000)))
+
+    class Query(graphene.ObjectType):
+        reporter = graphene.Field(reporter_type)
+
+        def resolve_reporter(self, info):
+            return Reporter(1, articles=articles)
+
+    def batch_get_items(model, keys, **kwargs):
+        return dict((key, Article(key, headline='Article %d' % key)) for key in keys)
+
+    schema = graphene.Schema(query=Query)
+    query = '{ reporter { articles(first: 2%s) { edges { cursor node { headline } } } } }'
+    with patch('graphene_pynamodb.relationships.batch_get_items', side_effect=batch_get_items) as batch_get:
+        result = schema.execute(query % ', after: "%s"' % get_key_codec(Article).get_position_cursor(8000, 8000))
+        assert not result.errors
+        edges = result.data['reporter']['articles']['edges']
+        assert [edge['node']['headline'] for edge in edges] == ['Article 8001', 'Article 8002']
+        assert batch_get.call_args[0][1] == [8001, 8002]
+        # the position matched, no index of the keys was needed
+        assert articles._positions is None
+
+        result = schema.execute(query % ', after: "%s"' % edges[-1]['cursor'])
+        assert [edge['node']['headline'] for edge in result.data['reporter']['articles']['edges']] == [
+            'Article 8003', 'Article 8004']
+
+        # cursors of items that moved, and key cursors, go through the index
+        articles._keys.insert(0, 10000)
+        result = schema.execute(query % ', after: "%s"' % edges[-1]['cursor'])
+        assert [edge['node']['headline'] for edge in result.data['reporter']['articles']['edges']] == [
+            'Article 8003', 'Article 8004']
+        result = schema.execute(query % ', after: "%s"' % to_cursor(Article(9998)))
+        assert [edge['node']['headline'] for edge in result.data['reporter']['articles']['edges']] == [
+            'Article 9999']
+
+
+def test_relationship_connection_should_not_read_items_for_keys_only():
+    registry = Registry()
+    reporter_type = make_node_type(Reporter, registry=registry, exclude_fields=('custom_map',))
+    make_node_type(Article, registry=registry)
+
+    class Query(graphene.ObjectType):
+        reporter = graphene.Field(reporter_type)
+
+        def resolve_reporter(self, info):
+            return Reporter(1, articles=RelationshipResultList('id', Article, [4, 2, 9]))
+
+    schema = graphene.Schema(query=Query)
+    with patch('graphene_pynamodb.relationships.batch_get_items', return_value={}) as batch_get, \
+            patch('graphene_pynamodb.relationships.get_item') as get_item:
+        result = schema.execute(
+            '{ reporter { articles(first: 2) { edges { cursor node { __typename id } } } } }',
+            context_value={})
+        assert not result.errors
+        assert [edge['node'] for edge in result.data['reporter']['articles']['edges']] == [
+            {'__typename': 'ArticleNode', 'id': to_global_id('ArticleNode', 4)},
+            {'__typename': 'ArticleNode', 'id': to_global_id('ArticleNode', 2)},
+        ]
+        batch_get.assert_not_called()
+        get_item.assert_not_called()
+
+        result = schema.execute('{ reporter { articles(first: 2) { edges { node { headline } } } } }')
+        assert not result.errors
+        batch_get.assert_called_once()
@@ -0,0 +1,68 @@
+import graphene
+from graphene import Node
+from graphql_relay import from_global_id, to_global_id
+from mock import patch
+from pytest import raises
+
+from .helpers import make_node_type
+from .models import Article, Chapter
+from ..keys import get_key_codec
+from ..planner import EXHAUSTED
+from ..utils import from_cursor, get_last_evaluated_key, key_to_cursor, to_cursor
+
+
+def test_key_codec_should_round_trip_composite_ids():
+    codec = get_key_codec(Chapter)
+    assert get_key_codec(Chapter) is codec
+    id = codec.to_id(('dune', 8))
+    assert codec.from_id(id) == ('dune', 8)
+    assert len(id) < len('{"book": "dune", "number": 8}')
+
+    # models without a range key keep their hash key as ID
+    assert get_key_codec(Article).to_id(3) == 3
+    assert get_key_codec(Article).from_id('3') == 3
+    with raises(ValueError):
+        codec.from_id('not-an-id')
+
+
+def test_key_codec_should_round_trip_cursors():
+    index_key = {'book': {'S': 'dune'}, 'number': {'N': '8'}, 'author': {'S': 'frank'}, 'published': {'N': '1965'}}
+    assert from_cursor(key_to_cursor(Chapter, index_key), Chapter)[1] == index_key
+
+    segments = {'segments': [{'id': {'N': '4'}}, None, EXHAUSTED]}
+    assert from_cursor(key_to_cursor(Article, segments), Article)[1] == segments
+
+    # JSON cursors written by earlier versions
+    assert from_cursor(to_global_id('Article', '{"id": {"N": "1"}}'), Article)[1] == {'id': {'N': '1'}}
+    assert from_cursor(to_global_id('Article', '{"id": {"N": "1"}}')) == ('Article', {'id': {'N': '1'}})
+    with raises(ValueError):
+        from_cursor('AQE', Article)
+
+
+def test_item_cursors_should_match_last_evaluated_key_cursors():
+    for item in (Article(12, headline='Hi!'), Chapter('dune', 8), Chapter('dune', 1.5)):
+        assert to_cursor(item) == key_to_cursor(type(item), get_last_evaluated_key(item))
+    assert make_node_type(Chapter)._meta.key_codec is get_key_codec(Chapter)
+
+
+def test_range_keyed_models_should_be_nodes():
+    chapter_type = make_node_type(Chapter)
+
+    class Query(graphene.ObjectType):
+        node = Node.Field()
+        chapter = graphene.Field(chapter_type)
+
+        def resolve_chapter(self, info):
+            return Chapter('dune', 8, title='Dune')
+
+    schema = graphene.Schema(query=Query)
+    result = schema.execute('{ chapter { id } }')
+    assert not result.errors
+    global_id = result.data['chapter']['id']
+    assert from_global_id(global_id)[0] == 'ChapterNode'
+
+    with patch.object(Chapter, 'get', return_value=Chapter('dune', 8, title='Dune')) as get:
+        result = schema.execute('{ node(id: "%s") { ... on ChapterNode { title } } }' % global_id)
+    assert not result.errors
+    assert result.data['node'] == {'title': 'Dune'}
+    assert get.call_args[0] == ('dune', 8)
@@ -0,0 +1,181 @@
+import graphene
+from mock import ANY, MagicMock, patch
+from pynamodb.exceptions import GetError
+from pytest import raises
+
+from .helpers import Info, make_dispatch, make_node_type, raw_article
+from .models import Article, Reporter
+from ..loaders import BatchLoader, batch_get_items, batch_get_tables, get_batch_loader
+from ..registry import Registry
+from ..relationships import RelationshipResult, RelationshipResultList, load_relationships
+
+
+def setup_schema():
+    registry = Registry()
+    make_node_type(Reporter, registry=registry, exclude_fields=('custom_map',))
+    article_type = make_node_type(Article, registry=registry)
+
+    articles = [
+        Article(id, headline='Article %d' % id, reporter=RelationshipResult('id', reporter_id, Reporter))
+        for id, reporter_id in ((1, 1), (2, 2), (3, 1), (4, 3))
+    ]
+
+    class Query(graphene.ObjectType):
+        articles = graphene.List(article_type)
+
+        def resolve_articles(self, info):
+            return articles
+
+    return graphene.Schema(query=Query)
+
+
+def test_one_to_one_should_load_in_one_batch():
+    schema = setup_schema()
+    reporters = [Reporter(1, first_name='John'), Reporter(2, first_name='Jane')]
+    query = '{ articles { headline reporter { firstName } } }'
+    items = {Reporter: {1: reporters[0], 2: reporters[1]}}
+    with patch('graphene_pynamodb.loaders.batch_get_tables', return_value=items) as batch_get, \
+            patch.object(Reporter, 'get', MagicMock()) as get:
+        result = schema.execute(query, context_value={})
+    assert not result.errors
+    batch_get.assert_called_once_with({Reporter: ([1, 2, 3], ['first_name', 'id'], None)}, identity_map=ANY)
+    get.assert_not_called()
+    assert [article['reporter'] for article in result.data['articles']] == [
+        {'firstName': 'John'}, {'firstName': 'Jane'}, {'firstName': 'John'}, None
+    ]
+
+
+def test_one_to_one_should_load_lazily_without_context():
+    schema = setup_schema()
+    query = '{ articles { reporter { firstName } } }'
+    with patch('graphene_pynamodb.loaders.batch_get_tables', MagicMock()) as batch_get, \
+            patch.object(Reporter, 'get', return_value=Reporter(1, first_name='John')) as get:
+        result = schema.execute(query)
+    assert not result.errors
+    batch_get.assert_not_called()
+    assert get.call_count == 4
+
+
+def test_batch_get_items_should_chunk_and_keep_keys():
+    def get_page(keys, **kwargs):
+        # article 7 does not exist
+        return [raw_article(int(key['id'])) for key in keys if key['id'] != '7'], None
+
+    keys = list(range(250)) + [3]
+    with patch.object(Article, '_batch_get_page', side_effect=get_page) as batch_get_page:
+        items = batch_get_items(Article, keys, attributes_to_get=['id'])
+    assert sorted(len(call[0][0]) for call in batch_get_page.call_args_list) == [50, 100, 100]
+    assert batch_get_page.call_args[1]['attributes_to_get'] == ['id']
+    assert 7 not in items
+    assert items[3].headline == 'Article 3'
+    assert len(items) == 249
+
+
+@patch('graphene_pynamodb.loaders.time.sleep')
+def test_batch_get_items_should_retry_unprocessed_keys(sleep):
+    pages = [([raw_article(1)], [{'id': '2'}]), ([raw_article(2)], None)]
+    with patch.object(Article, '_batch_get_page', side_effect=pages) as batch_get_page:
+        items = batch_get_items(Article, [1, 2])
+    assert batch_get_page.call_args[0][0] == [{'id': '2'}]
+    assert sleep.call_count == 1
+    assert sorted(items) == [1, 2]
+
+    with patch.object(Article, '_batch_get_page', return_value=([], [{'id': '2'}])):
+        with raises(GetError):
+            batch_get_items(Article, [2], max_retries=2)
+
+
+@patch('graphene_pynamodb.loaders.time.sleep')
+def test_batch_get_tables_should_share_calls_across_tables(sleep):
+    calls = []
+    with patch('pynamodb.connection.base.Connection.dispatch',
+               side_effect=make_dispatch(calls, [{'id': {'N': '203'}}])):
+        items = batch_get_tables({
+            Article: (list(range(150)), ['headline', 'id'], None),
+            Reporter: ([201, 202, 203], None, True),
+        })
+    assert sorted(sum(len(request['Keys']) for request in call.values()) for call in calls) == [1, 53, 100]
+    both = next(call for call in calls if len(call) == 2)
+    assert both[Article.Meta.table_name]['ExpressionAttributeNames'] == {'#0': 'headline', '#1': 'id'}
+    assert both[Reporter.Meta.table_name] == {'Keys': ANY, 'ConsistentRead': True}
+    # the unprocessed key is read again, alone
+    assert [call for call in calls if len(call) == 1 and Reporter.Meta.table_name in call]
+    assert sorted(items[Reporter]) == [201, 202, 203]
+    assert len(items[Article]) == 150
+    assert items[Reporter][203].favorite_article._self_key == 303
+
+
+def test_breadth_first_should_read_one_batch_per_level():
+    registry = Registry()
+    reporter_type = make_node_type(Reporter, registry=registry, exclude_fields=('custom_map',))
+    article_type = make_node_type(Article, registry=registry)
+    articles = [Article(id, reporter=RelationshipResult('id', id, Reporter)) for id in range(1, 51)]
+    reporters = [
+        Reporter(id, favorite_article=RelationshipResult('id', id, Article),
+                 articles=RelationshipResultList('id', Article, [id * 10, id * 10 + 1, id * 10 + 2]))
+        for id in range(51, 56)
+    ]
+
+    class Query(graphene.ObjectType):
+        articles = graphene.List(article_type)
+        reporters = graphene.List(reporter_type)
+
+        def resolve_articles(self, info):
+            return articles
+
+        def resolve_reporters(self, info):
+            return reporters
+
+    query = '''{
+        articles { reporter { firstName favoriteArticle { headline } } }
+        reporters { favoriteArticle { headline } articles(first: 2) { edges { node { headline } } } }
+    }'''
+    calls = []
+    with patch('pynamodb.connection.base.Connection.dispatch', side_effect=make_dispatch(calls)):
+        result = graphene.Schema(query=Query).execute(query, context_value={'breadth_first': True})
+    assert not result.errors
+    assert result.data['articles'][9]['reporter'] == {
+        'firstName': 'Reporter 10', 'favoriteArticle': {'headline': 'Article 110'}}
+    assert result.data['reporters'][0] == {
+        'favoriteArticle': {'headline': 'Article 51'},
+        'articles': {'edges': [{'node': {'headline': 'Article 510'}}, {'node': {'headline': 'Article 511'}}]},
+    }
+    # one call per level, the first one reads both tables
+    assert [sorted((table_name, len(request['Keys'])) for table_name, request in call.items()) for call in calls] == [
+        [(Article.Meta.table_name, 15), (Reporter.Meta.table_name, 50)],
+        [(Article.Meta.table_name, 50)],
+    ]
+
+
+def test_batch_loader_should_be_request_scoped():
+    info = Info({})
+    assert isinstance(get_batch_loader(info), BatchLoader)
+    assert get_batch_loader(info) is get_batch_loader(info)
+    assert get_batch_loader(Info({})) is not get_batch_loader(info)
+    assert get_batch_loader(Info(None)) is None
+
+
+def test_one_to_one_should_read_one_batch_per_level():
+    schema = setup_schema()
+    query = '{ articles { reporter { firstName favoriteArticle { headline } } } }'
+    calls = []
+    with patch('pynamodb.connection.base.Connection.dispatch', side_effect=make_dispatch(calls)):
+        result = schema.execute(query, context_value={})
+    assert not result.errors
+    assert result.data['articles'][0] == {'reporter': {'firstName': 'Reporter 1', 'favoriteArticle': {
+        'headline': 'Article 101'}}}
+    assert [list(call) for call in calls] == [[Reporter.Meta.table_name], [Article.Meta.table_name]]
+
+
+def test_load_relationships_should_share_batches_across_models():
+    article = RelationshipResult('id', 1, Article)
+    reporter = RelationshipResult('id', 2, Reporter)
+    articles = RelationshipResultList('id', Article, [3, 4])
+    calls = []
+    with patch('pynamodb.connection.base.Connection.dispatch', side_effect=make_dispatch(calls)):
+        load_relationships([article, reporter, articles])
+        assert article.headline == 'Article 1'
+        assert reporter.first_name == 'Reporter 2'
+        assert [item.headline for item in articles.resolve()] == ['Article 3', 'Article 4']
+    assert len(calls) == 1
+    assert sorted(len(request['Keys']) for request in calls[0].values()) == [1, 3]
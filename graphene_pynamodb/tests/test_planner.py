@@ -0,0 +1,269 @@
+import pytest
+from mock import MagicMock, patch
+from pynamodb.attributes import BinaryAttribute, NumberSetAttribute, UnicodeAttribute
+from pynamodb.models import Model
+
+from .helpers import FakeResultIterator, Info, make_connection_schema, make_node_type
+from .models import Article, Chapter
+from ..cache import IdentityMap, get_identity_map
+from ..planner import BATCH_GET, EXHAUSTED, INDEX_QUERY, QUERY, SCAN, ParallelScanResult, plan_query
+from ..utils import from_cursor
+
+
+def test_planner_should_prefer_table_query():
+    plan = plan_query(Chapter, {'book': 'dune', 'number': '3', 'author': 'frank'})
+    assert plan.operation == QUERY
+    assert plan.hash_key == 'dune'
+    assert plan.range_key_condition is not None
+
+    # the author index is not used, its key still has to match
+    assert str(plan.filter_condition) == str(Chapter.author == 'frank')
+
+    with patch.object(Chapter, 'query', return_value=[]) as query:
+        plan(limit=10, consistent_read=True)
+    query.assert_called_once_with('dune', range_key_condition=plan.range_key_condition,
+                                  filter_condition=plan.filter_condition, limit=10, consistent_read=True)
+
+
+def test_planner_should_use_index_query():
+    plan = plan_query(Chapter, {'author': 'frank', 'published': '1965'})
+    assert plan.operation == INDEX_QUERY
+    assert plan.index is Chapter.author_index
+    assert plan.hash_key == 'frank'
+
+    with patch.object(Chapter, 'query', return_value=[]) as query:
+        plan(limit=10, consistent_read=True)
+    # global secondary indexes can not be read consistently
+    assert 'consistent_read' not in query.call_args[1] or not query.call_args[1]['consistent_read']
+    assert query.call_args[1]['index_name'] == 'author-index'
+
+
+def test_planner_should_use_local_index_query():
+    plan = plan_query(Chapter, {'book': 'dune', 'chapter_title': 'Prologue'})
+    assert plan.operation == INDEX_QUERY
+    assert plan.index is Chapter.chapter_index
+    assert plan.hash_key == 'dune'
+    assert str(plan.range_key_condition) == str(Chapter.chapter_title == 'Prologue')
+    assert plan.filter_condition is None
+
+    # the range key of the table comes first
+    plan = plan_query(Chapter, {'book': 'dune', 'number': '3', 'chapter_title': 'Prologue'})
+    assert plan.operation == QUERY
+    assert str(plan.filter_condition) == str(Chapter.chapter_title == 'Prologue')
+
+
+def test_planner_should_skip_partial_projections():
+    assert plan_query(Chapter, {'title': 'Prologue'}).operation == SCAN
+
+
+def test_planner_should_batch_get_hash_keys():
+    plan = plan_query(Article, {'id_in': ['3', '1', '3']})
+    assert plan.operation == BATCH_GET
+    assert plan.keys == [3, 1]
+
+    with patch.object(Article, '_batch_get_page', return_value=([{'id': {'N': '3'}}], None)) as batch_get_page:
+        items = plan(limit=1, consistent_read=False)
+    assert batch_get_page.call_args[0][0] == [{'id': '3'}]
+    assert batch_get_page.call_args[1]['consistent_read'] is False
+    assert [item.id for item in items] == [3]
+    assert items.last_evaluated_key == {'id': {'N': '3'}}
+
+    # items the request already read are not read again
+    identity_map = IdentityMap()
+    article = identity_map.add(Article(1))
+    with patch.object(Article, '_batch_get_page', MagicMock()) as batch_get_page:
+        items = plan(last_evaluated_key={'id': {'N': '3'}}, identity_map=identity_map)
+    batch_get_page.assert_not_called()
+    assert list(items) == [article]
+    assert items.last_evaluated_key is None
+
+
+def test_planner_should_fall_back_to_scan():
+    plan = plan_query(Article, {'first': 5})
+    assert plan.operation == SCAN
+
+    with patch.object(Article, 'scan', return_value=[]) as scan:
+        plan(limit=5)
+    scan.assert_called_once_with(limit=5)
+
+
+def test_connection_should_expose_key_arguments():
+    schema = make_connection_schema(make_node_type(Chapter))
+    arguments = schema.get_query_type().fields['chapters'].args
+    assert all(name in arguments for name in ['book', 'number', 'author', 'published', 'chapterTitle'])
+    assert 'title' not in arguments
+    assert 'bookIn' not in arguments
+
+    results = FakeResultIterator([Chapter('dune', 1, chapter_title='One')])
+    with patch.object(Chapter, 'query', return_value=results) as query:
+        result = schema.execute('{ chapters(book: "dune", first: 1) { edges { node { chapterTitle } } } }')
+    assert not result.errors
+    assert query.call_args[0] == ('dune',)
+    assert result.data['chapters']['edges'] == [{'node': {'chapterTitle': 'One'}}]
+
+
+def test_planner_should_scan_segments_in_parallel():
+    pages = {
+        0: FakeResultIterator([Article(1), Article(2)], {'id': {'N': '2'}}),
+        1: FakeResultIterator([Article(3)]),
+        2: FakeResultIterator([]),
+    }
+
+    def scan(segment=None, total_segments=None, **kwargs):
+        assert total_segments == 3
+        assert kwargs['limit'] == 2
+        return pages[segment]
+
+    plan = plan_query(Article, {}, total_segments=3)
+    with patch.object(Article, 'scan', side_effect=scan) as mocked:
+        result = plan(limit=4)
+    assert mocked.call_count == 3
+    assert [item.id for item in result] == [1, 2, 3]
+    assert result.last_evaluated_key == {'segments': [{'id': {'N': '2'}}, False, False]}
+    # the first item leaves the other segments where they started, except the empty one
+    assert result.segments_at(result[0]) == [{'id': {'N': '1'}}, None, False]
+
+    # exhausted segments are not read again
+    with patch.object(Article, 'scan', return_value=FakeResultIterator([Article(4)])) as mocked:
+        result = plan(limit=4, last_evaluated_key={'segments': [{'id': {'N': '2'}}, False, False]})
+    mocked.assert_called_once()
+    assert mocked.call_args[1]['segment'] == 0
+    assert mocked.call_args[1]['last_evaluated_key'] == {'id': {'N': '2'}}
+    assert result.last_evaluated_key is None
+
+
+def test_planner_should_trim_parallel_scan_to_limit():
+    pages = {
+        0: FakeResultIterator([Article(1)]),
+        1: FakeResultIterator([Article(2), Article(3)], {'id': {'N': '3'}}),
+    }
+    plan = plan_query(Article, {}, total_segments=2)
+    with patch.object(Article, 'scan', side_effect=lambda segment=None, **kwargs: pages[segment]):
+        result = plan(limit=2)
+    assert [item.id for item in result] == [1, 2]
+    assert result.last_evaluated_key == {'segments': [False, {'id': {'N': '2'}}]}
+
+
+def test_connection_should_resume_parallel_scan_from_cursor():
+    pages = {
+        0: FakeResultIterator([Article(1, headline='One')], {'id': {'N': '1'}}),
+        1: FakeResultIterator([]),
+    }
+    schema = make_connection_schema(make_node_type(Article), total_segments=2)
+    query = '{ articles(first: 2) { edges { node { headline } } pageInfo { hasNextPage endCursor } } }'
+    with patch.object(Article, 'scan', side_effect=lambda segment=None, **kwargs: pages[segment]):
+        result = schema.execute(query)
+    assert not result.errors
+    assert result.data['articles']['pageInfo']['hasNextPage']
+
+    after = result.data['articles']['pageInfo']['endCursor']
+    query = '{ articles(first: 2, after: "%s") { pageInfo { hasNextPage } } }' % after
+    with patch.object(Article, 'scan', return_value=FakeResultIterator([])) as scan:
+        result = schema.execute(query)
+    assert not result.errors
+    scan.assert_called_once()
+    assert scan.call_args[1]['last_evaluated_key'] == {'id': {'N': '1'}}
+    assert not result.data['articles']['pageInfo']['hasNextPage']
+
+
+def test_planner_should_compile_filters():
+    plan = plan_query(Chapter, {'filter': {
+        'book': {'eq': 'dune'},
+        'number': {'between': [1.0, 3.0]},
+        'chapter_title': {'begins_with': 'The', 'ne': 'The End'},
+        'published': {'exists': True, 'in_': [1965.0, 1966.0]},
+    }})
+    assert plan.operation == QUERY
+    assert plan.hash_key == 'dune'
+    assert str(plan.range_key_condition) == str(Chapter.number.between(1, 3))
+    assert str(plan.filter_condition) == str(
+        Chapter.chapter_title.startswith('The') & (Chapter.chapter_title != 'The End') &
+        Chapter.published.exists() & Chapter.published.is_in(1965, 1966)
+    )
+
+    plan = plan_query(Chapter, {'filter': {'author': {'eq': 'frank'}, 'published': {'gt': 1960.0}}})
+    assert plan.operation == INDEX_QUERY
+    assert str(plan.range_key_condition) == str(Chapter.published > 1960)
+    assert plan.filter_condition is None
+
+    with pytest.raises(ValueError):
+        plan_query(Chapter, {'book': 'dune', 'number': '1', 'filter': {'number': {'lt': 3.0}}})
+
+
+def test_planner_should_scan_when_batch_get_can_not_filter():
+    plan = plan_query(Article, {'id_in': ['1', '2'], 'filter': {'headline': {'contains': 'Hi'}}})
+    assert plan.operation == SCAN
+    assert str(plan.filter_condition) == str(Article.headline.contains('Hi') & Article.id.is_in(1, 2))
+
+
+def test_connection_should_expose_filter_argument():
+
+    schema = make_connection_schema(make_node_type(Article))
+    query = '{ articles(first: 1, filter: {headline: {beginsWith: "Hi"}, id: {in: [1, 3]}}) { edges { cursor } } }'
+    with patch.object(Article, 'scan', return_value=FakeResultIterator([])) as scan:
+        result = schema.execute(query)
+    assert not result.errors
+    assert str(scan.call_args[1]['filter_condition']) == str(
+        Article.headline.startswith('Hi') & Article.id.is_in(1, 3))
+
+
+def test_connection_should_page_index_queries_from_edge_cursors():
+    schema = make_connection_schema(make_node_type(Chapter))
+    chapter = Chapter('dune', 3, author='frank', published=1965)
+    query = '{ chapters(author: "frank", first: 1) { edges { cursor } pageInfo { startCursor } } }'
+    with patch.object(Chapter, 'query', return_value=FakeResultIterator([chapter])):
+        result = schema.execute(query)
+    assert not result.errors
+    cursor = result.data['chapters']['edges'][0]['cursor']
+    assert result.data['chapters']['pageInfo']['startCursor'] == cursor
+
+    query = '{ chapters(author: "frank", first: 1, after: "%s") { edges { cursor } } }' % cursor
+    with patch.object(Chapter, 'query', return_value=FakeResultIterator([])) as index_query:
+        result = schema.execute(query)
+    assert not result.errors
+    assert index_query.call_args[1]['index_name'] == 'author-index'
+    # DynamoDB wants the table keys and the index keys to resume an index query
+    assert index_query.call_args[1]['last_evaluated_key'] == {
+        'book': {'S': 'dune'}, 'number': {'N': '3'}, 'author': {'S': 'frank'}, 'published': {'N': '1965'},
+    }
+
+
+def test_connection_should_resume_parallel_scan_from_a_shared_item():
+    schema = make_connection_schema(make_node_type(Article), total_segments=2)
+    context = {}
+    # the request already read the article whole, the scan reads a projection of it
+    get_identity_map(Info(context)).add(Article(1, headline='One'))
+    pages = {
+        0: FakeResultIterator([Article(1, headline='One')], {'id': {'N': '1'}}),
+        1: FakeResultIterator([]),
+    }
+    query = '{ articles(first: 2) { edges { cursor node { headline } } } }'
+    with patch.object(Article, 'scan', side_effect=lambda segment=None, **kwargs: pages[segment]):
+        result = schema.execute(query, context_value=context)
+    assert not result.errors
+    assert result.data['articles']['edges'][0]['node'] == {'headline': 'One'}
+
+
+def test_parallel_scan_cursors_should_name_keys_by_attribute_name():
+    class Badge(Model):
+        class Meta:
+            table_name = 'test_graphene_pynamodb_badges'
+
+        uid = UnicodeAttribute(hash_key=True, attr_name='UID')
+
+    pages = [([Badge('a'), Badge('b')], {'UID': {'S': 'b'}}), ([Badge('c')], EXHAUSTED)]
+    result = ParallelScanResult(Badge, [None, None], pages, limit=1)
+    assert result.last_evaluated_key == {'segments': [{'UID': {'S': 'a'}}, None]}
+    assert from_cursor(result.cursor_for(result[0]), Badge)[1] == result.last_evaluated_key
+
+
+def test_connection_should_skip_filter_argument_without_filterable_attributes():
+    class Blob(Model):
+        class Meta:
+            table_name = 'test_graphene_pynamodb_blobs'
+
+        key = BinaryAttribute(hash_key=True)
+        sizes = NumberSetAttribute(null=True)
+
+    schema = make_connection_schema(make_node_type(Blob))
+    assert 'filter' not in schema.get_query_type().fields['blobs'].args
@@ -559,7 +559,7 @@ def test_should_support_after():
     assert result.data['reporter']['articles']['edges'] == expected['reporter']['articles']['edges']
 
 
-def test_root_scan_should_warn_on_params():
+def test_root_scan_should_resume_after():
     class ArticleNode(PynamoObjectType):
         class Meta:
             model = Article
@@ -569,9 +569,10 @@ def test_root_scan_should_warn_on_params():
         node = Node.Field()
         articles = PynamoConnectionField(ArticleNode)
 
+    # the cursor holds the last_evaluated_key {"id": {"N": "1"}}
     query = '''
         query ArticlesQuery {
-          articles(after: "QXJ0aWNsZU5vZGU6MQ==") {
+          articles(after: "QXJ0aWNsZTp7ImlkIjogeyJOIjogIjEifX0=") {
             edges {
               node {
                 id
@@ -584,8 +585,8 @@ def test_root_scan_should_warn_on_params():
 
     schema = graphene.Schema(query=Query)
     result = schema.execute(query)
-    assert result.errors
-    assert isinstance(result.errors[0].original_error, NotImplementedError)
+    assert not result.errors
+    assert {'node': {'id': 'QXJ0aWNsZU5vZGU6MQ==', 'headline': 'Hi!'}} not in result.data['articles']['edges']
 
 
 def test_root_scan_should_fastforward_on_after():
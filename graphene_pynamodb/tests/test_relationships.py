@@ -1,11 +1,11 @@
 import graphene
 import pytest
 from graphene import Node
-from mock import MagicMock
+from mock import MagicMock, patch
 from wrapt import ObjectProxy
 
 from .models import Reporter, Article
-from ..relationships import OneToOne, OneToMany, RelationshipResult
+from ..relationships import OneToOne, OneToMany, RelationshipResult, RelationshipResultList
 from ..types import PynamoObjectType
 
 
@@ -212,3 +212,35 @@ def test_onetomany_should_handle_not_being_lazy():
     # make sure our call count is still 1
     MockArticle.batch_get.assert_called_once()
     MockArticle.get.assert_not_called()
+
+
+def test_result_should_load_projection():
+    MockArticle = ObjectProxy(Article)
+    MockArticle.get = MagicMock(return_value=Article(1, headline="Hi!"))
+    relationship = RelationshipResult('id', 1, MockArticle)
+    relationship._self_set_projection(['headline', 'id'])
+
+    assert relationship.id == 1
+    MockArticle.get.assert_not_called()
+    assert relationship.headline == "Hi!"
+    MockArticle.get.assert_called_once_with(1, attributes_to_get=['headline', 'id'])
+
+    # a selection covered by the loaded attributes does not load again
+    relationship._self_set_projection(['id'])
+    assert relationship.headline == "Hi!"
+    assert MockArticle.get.call_count == 1
+
+    # a wider selection loads the union of both
+    relationship._self_set_projection(['id', 'reporter'])
+    assert relationship.headline == "Hi!"
+    MockArticle.get.assert_called_with(1, attributes_to_get=['headline', 'id', 'reporter'])
+
+
+def test_result_list_should_resolve_in_key_order():
+    articles = RelationshipResultList('id', Article, [3, 1, 2, 1])
+    with patch('graphene_pynamodb.relationships.batch_get_items',
+               return_value={1: Article(1), 3: Article(3)}) as batch_get:
+        resolved = articles.resolve(attributes_to_get=['id'])
+    batch_get.assert_called_once_with(Article, [3, 1, 2, 1], attributes_to_get=['id'], consistent_read=None,
+                                      identity_map=None)
+    assert [article and article.id for article in resolved] == [3, 1, None, 1]
@@ -0,0 +1,137 @@
+import fcntl
+import os
+
+import pytest
+from mock import patch
+
+from .models import Article
+from ..cache import get_cached_item, cache_item, set_item_cache
+from ..shared_cache import SharedMemoryCache, decode_item, encode_item
+
+
+@pytest.fixture
+def shared_cache(tmpdir):
+    cache = SharedMemoryCache(str(tmpdir.join('cache')), slots=64, slot_size=256)
+    yield cache
+    cache.close()
+
+
+def test_item_encoding_should_round_trip():
+    data = {
+        'id': {'N': '1'},
+        'headline': {'S': 'Héllo'},
+        'image': {'B': b'\x00\xff'},
+        'published': {'BOOL': True},
+        'deleted': {'NULL': True},
+        'tags': {'SS': ['a', 'b']},
+        'scores': {'NS': ['1', '2.5']},
+        'blobs': {'BS': [b'\x01']},
+        'history': {'L': [{'S': 'x' * 200}, {'M': {'n': {'N': '3'}}}]},
+    }
+    encoded = encode_item(data)
+    assert decode_item(encoded) == data
+    # type tags and varint lengths instead of json
+    assert len(encoded) < len(repr(data))
+    assert decode_item(encode_item({})) == {}
+
+
+def test_shared_cache_should_store_expire_and_delete(shared_cache):
+    shared_cache.set('a', {'id': {'N': '1'}}, 60)
+    assert shared_cache.get('a') == {'id': {'N': '1'}}
+    assert shared_cache.get('b') is None
+
+    shared_cache.set('a', {'id': {'N': '2'}}, 60)
+    assert shared_cache.get('a') == {'id': {'N': '2'}}
+    shared_cache.delete('a')
+    assert shared_cache.get('a') is None
+
+    shared_cache.set('b', {'id': {'N': '3'}}, -1)
+    assert shared_cache.get('b') is None
+
+    # larger than a slot
+    shared_cache.set('c', {'body': {'S': 'x' * 1024}}, 60)
+    assert shared_cache.get('c') is None
+
+    shared_cache.set('d', {}, 60)
+    shared_cache.clear()
+    assert shared_cache.get('d') is None
+
+
+def test_shared_cache_should_keep_probing_on_collisions(shared_cache):
+    for i in range(200):
+        shared_cache.set('key %d' % i, {'id': {'N': str(i)}}, 60)
+    # only PROBES slots are tried per key, recent keys evict the ones expiring first
+    assert shared_cache.get('key 199') == {'id': {'N': '199'}}
+    assert sum(shared_cache.get('key %d' % i) is not None for i in range(200)) <= 64
+
+
+def test_shared_cache_should_reject_torn_reads(shared_cache):
+    shared_cache.set('a', {'id': {'N': '1'}}, 60)
+    with patch('graphene_pynamodb.shared_cache.zlib.crc32', return_value=0):
+        assert shared_cache.get('a') is None
+
+
+def test_shared_cache_should_be_shared_across_processes(tmpdir):
+    path = str(tmpdir.join('cache'))
+    cache = SharedMemoryCache(path, slots=64, slot_size=256)
+    pid = os.fork()
+    if pid == 0:
+        child = SharedMemoryCache(path, slots=64, slot_size=256)
+        child.set('written by the child', {'id': {'N': '1'}}, 60)
+        os._exit(0)
+    os.waitpid(pid, 0)
+    assert cache.get('written by the child') == {'id': {'N': '1'}}
+    cache.close()
+
+
+def test_shared_cache_should_lock_writers_of_forked_processes(tmpdir):
+    cache = SharedMemoryCache(str(tmpdir.join('cache')), slots=64, slot_size=256)
+    with cache._file_lock():
+        pid = os.fork()
+        if pid == 0:
+            # the child opened before forking must wait for the parent
+            try:
+                fcntl.flock(cache._lock_fd(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os._exit(0)
+            os._exit(1)
+        _, status = os.waitpid(pid, 0)
+    assert os.WEXITSTATUS(status) == 0
+    cache.close()
+
+
+def test_shared_cache_should_back_the_item_cache(shared_cache):
+    set_item_cache(shared_cache)
+    try:
+        with patch.object(Article.Meta, 'cache_ttl', 60, create=True):
+            cache_item(Article, 1, Article(1, headline='Hi!'))
+            assert get_cached_item(Article, 1).headline == 'Hi!'
+    finally:
+        set_item_cache(None)
+
+
+def test_shared_cache_should_drop_items_that_outgrow_their_slot(shared_cache):
+    shared_cache.set('a', {'body': {'S': 'short'}}, 60)
+    shared_cache.set('a', {'body': {'S': 'x' * 1024}}, 60)
+    assert shared_cache.get('a') is None
+
+
+def test_shared_cache_should_not_resize_mapped_files(tmpdir):
+    path = str(tmpdir.join('cache'))
+    cache = SharedMemoryCache(path, slots=64, slot_size=256)
+    cache.set('a', {'id': {'N': '1'}}, 60)
+
+    # a worker deployed with other dimensions gets its own file
+    resized = SharedMemoryCache(path, slots=16, slot_size=256)
+    assert resized.path != cache.path
+    assert resized.get('a') is None
+    assert cache.get('a') == {'id': {'N': '1'}}
+
+    # an unreadable file is replaced by a new one, the file mapped by running workers is left alone
+    with open(cache.path, 'r+b') as cache_file:
+        cache_file.write(b'XXXX')
+    reopened = SharedMemoryCache(path, slots=64, slot_size=256)
+    assert reopened.get('a') is None
+    assert os.path.getsize(cache.path) == os.fstat(cache._fd).st_size
+    for opened in (cache, resized, reopened):
+        opened.close()
@@ -1,4 +1,4 @@
-from graphene import Field, GlobalID, Int, Interface, ObjectType
+from graphene import Field, GlobalID, Int, Interface, ObjectType, Schema
 from graphene.relay import Node, is_node
 from mock import patch
 
@@ -71,3 +71,14 @@ def test_object_type():
     assert issubclass(Human, ObjectType)
     assert sorted(list(Human._meta.fields.keys())) == ['headline', 'id', 'pub_date', 'reporter']
     assert is_node(Human)
+
+
+def test_pynamo_get_node_should_project_selection():
+    class Query(ObjectType):
+        node = Node.Field()
+
+    schema = Schema(query=Query, types=[Human])
+    with patch('graphene_pynamodb.tests.models.Article.get', return_value=Article(id=1, headline='Hi!')) as get:
+        result = schema.execute('{ node(id: "SHVtYW46MQ==") { ... on Human { headline } } }')
+    assert not result.errors
+    get.assert_called_with(1, attributes_to_get=['headline', 'id'])
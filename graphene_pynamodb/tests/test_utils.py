@@ -1,8 +1,12 @@
+import graphene
 import pytest
+from graphene import Node
 from pynamodb.attributes import UnicodeAttribute, NumberAttribute
 from pynamodb.models import Model
 
-from ..utils import get_key_name
+from ..registry import Registry
+from ..types import PynamoObjectType
+from ..utils import get_attributes_to_get, get_key_name
 
 
 def test_getkeyname_should_raiseerror():
@@ -30,3 +34,46 @@ def test_getkeyname_should_workonnumbers():
         myid = NumberAttribute(hash_key=True)
 
     assert get_key_name(MyModel) == 'myid'
+
+
+def test_getattributestoget_should_follow_selection():
+    from .models import Article
+
+    class ArticleNode(PynamoObjectType):
+        class Meta:
+            model = Article
+            registry = Registry()
+            interfaces = (Node,)
+
+    class CountedArticleNode(PynamoObjectType):
+        class Meta:
+            model = Article
+            registry = Registry()
+            interfaces = (Node,)
+
+        def resolve_headline(self, info):
+            return self.headline.upper()
+
+    projections = {}
+
+    class Query(graphene.ObjectType):
+        article = graphene.Field(ArticleNode)
+        counted_article = graphene.Field(CountedArticleNode)
+
+        def resolve_article(self, info):
+            projections['article'] = get_attributes_to_get(ArticleNode, info)
+            return Article(1, headline='Hi!')
+
+        def resolve_counted_article(self, info):
+            projections['counted_article'] = get_attributes_to_get(CountedArticleNode, info)
+            return Article(1, headline='Hi!')
+
+    schema = graphene.Schema(query=Query)
+    result = schema.execute('''
+        query { article { id ...ArticleFields } countedArticle { headline } }
+        fragment ArticleFields on ArticleNode { headline }
+    ''')
+    assert not result.errors
+    assert projections['article'] == ['headline', 'id']
+    # custom resolvers may read any attribute
+    assert projections['counted_article'] is None
@@ -7,13 +7,18 @@ from graphene.relay import is_node
 from graphene.types.objecttype import ObjectType, ObjectTypeOptions
 from graphene.types.interface import Interface,  InterfaceOptions
 from graphene.types.utils import yank_fields_from_attrs
-from pynamodb.attributes import Attribute, NumberAttribute
+from pynamodb.attributes import Attribute
 from pynamodb.models import Model
 
+from .aio import get_async_client, get_item_async
+from .cache import get_cache_ttl, get_identity_map, get_item
+from .consistency import get_consistent_read
 from .converter import convert_pynamo_attribute
+from .keys import get_key_codec
 from .registry import Registry, get_global_registry
 from .relationships import RelationshipResult
-from .utils import get_key_name, connection_for_type, is_valid_pynamo_model, get_query_fields, get_model_fields
+from .utils import (connection_for_type, is_valid_pynamo_model, get_query_fields, get_model_fields,
+                    get_attributes_to_get)
 from graphene.utils.str_converters import to_snake_case
 
 
@@ -67,13 +72,16 @@ class PynamoObjectTypeOptions(ObjectTypeOptions):
     registry = None  # type: Registry
     connection = None  # type: Type[Connection]
     id = None  # type: str
+    consistent_read = None  # type: Union[bool, Callable]
+    key_codec = None  # type: KeyCodec
 
 
 class PynamoObjectType(ObjectType):
     @classmethod
     def __init_subclass_with_meta__(cls, model=None, registry=None, skip_registry=False,
                                     only_fields=(), exclude_fields=(), connection=None,
-                                    use_connection=None, interfaces=(), id=None, **options):
+                                    use_connection=None, interfaces=(), id=None, consistent_read=None,
+                                    **options):
         assert model and isclass(model) and issubclass(model, Model), (
             'You need to pass a valid PynamoDB Model in '
             '{}.Meta, received "{}".'
@@ -96,8 +104,8 @@ class PynamoObjectType(ObjectType):
             use_connection = any((issubclass(interface, Node) for interface in interfaces))
 
         if use_connection and not connection:
-            # We create the connection automatically
-            connection = Connection.create_type('{}Connection'.format(cls.__name__), node=cls)
+            # We create the connection automatically, with a totalCount
+            connection = connection_for_type(cls, '{}Connection'.format(cls.__name__))
 
         if connection is not None:
             assert issubclass(connection, Connection), (
@@ -110,6 +118,8 @@ class PynamoObjectType(ObjectType):
         _meta.fields = pynamo_fields
         _meta.connection = connection
         _meta.id = id or 'id'
+        _meta.consistent_read = consistent_read
+        _meta.key_codec = get_key_codec(model)
 
         super(PynamoObjectType, cls).__init_subclass_with_meta__(_meta=_meta, interfaces=interfaces, **options)
 
@@ -118,21 +128,57 @@ class PynamoObjectType(ObjectType):
 
     @classmethod
     def is_type_of(cls, root, info):
-        if isinstance(root, RelationshipResult) and root.__wrapped__ == cls._meta.model:
+        if isinstance(root, RelationshipResult) and issubclass(root._self_model, cls._meta.model):
+            # the lazy proxy is not loaded here, it reads what this selection needs when a field first asks for it
+            root._self_set_projection(get_attributes_to_get(cls, info))
+            root._self_consistent_read = get_consistent_read(cls, info, key=root._self_key)
+            root._self_identity_map = get_identity_map(info)
             return True
         return isinstance(root, cls._meta.model)
 
+    @classmethod
+    def get_node_key(cls, id):
+        """The key of the item of a node ID, a (hash, range) tuple for models with a range key"""
+        return cls._meta.key_codec.from_id(id)
+
     @classmethod
     def get_node(cls, info, id):
-        if isinstance(getattr(cls._meta.model, get_key_name(cls._meta.model)), NumberAttribute):
-            return cls._meta.model.get(int(id))
-        else:
-            return cls._meta.model.get(id)
+        id = cls.get_node_key(id)
+
+        attributes_to_get = get_attributes_to_get(cls, info)
+        identity_map = get_identity_map(info)
+        if identity_map is not None:
+            item = identity_map.get(cls._meta.model, id, attributes_to_get)
+            if item is not None:
+                return item
+
+        consistent_read = get_consistent_read(cls, info, key=id)
+        client = get_async_client(info)
+        if client is not None:
+            return cls.get_node_async(client, id, attributes_to_get, consistent_read, identity_map)
+
+        item = get_item(cls._meta.model, id, attributes_to_get=attributes_to_get, consistent_read=consistent_read)
+        if identity_map is not None:
+            # cached models are read whole
+            item = identity_map.add(item, attributes_to_get if not get_cache_ttl(cls._meta.model) else None)
+        return item
+
+    @classmethod
+    async def get_node_async(cls, client, id, attributes_to_get=None, consistent_read=False, identity_map=None):
+        item = await get_item_async(
+            client, cls._meta.model, id, attributes_to_get=attributes_to_get, consistent_read=consistent_read)
+        if identity_map is not None:
+            item = identity_map.add(item, attributes_to_get if not get_cache_ttl(cls._meta.model) else None)
+        return item
 
     def resolve_id(self, info):
         graphene_type = info.parent_type.graphene_type
         if is_node(graphene_type):
-            return getattr(self, get_key_name(graphene_type._meta.model))
+            key_codec = graphene_type._meta.key_codec
+            if isinstance(self, RelationshipResult):
+                # the proxy knows its key, its item is not read for it
+                return key_codec.to_id(self._self_key)
+            return key_codec.to_id(key_codec.get_key(self))
 
     @classmethod
     def get_connection(cls):
@@ -1,22 +1,26 @@
 import json
 from typing import Tuple
 from inspect import isclass
-from graphql_relay import from_global_id, to_global_id
 from pynamodb.attributes import Attribute
 from pynamodb.models import Model
 from collections import OrderedDict
+from graphql.language import ast
+from graphene.utils.str_converters import to_snake_case
+from graphql_relay import from_global_id
 
 
 
 
 import graphene
 
+from graphene_pynamodb.keys import get_key_codec
+
 MODEL_KEY_REGISTRY = {}
 
 def get_model_fields(model, excluding=None):
     excluding = excluding or []
     attributes = dict()
-    for attr_name, attr in model._fields.items():
+    for attr_name, attr in model.get_attributes().items():
         if attr_name in excluding:
             continue
         attributes[attr_name] = attr
@@ -43,6 +47,61 @@ def ast_to_dict(node, include_loc=False):
 
 
 
+def collect_query_fields(node, fragments):
+    """Recursively collects the fields selected under an AST node, expanding fragments
+    Args:
+        node (Field|FragmentDefinition|InlineFragment)
+        fragments (dict): fragment definitions of the query, by name
+    Returns:
+        dict: selected field names mapped to their own selections
+    """
+
+    fields = {}
+    if not node.selection_set:
+        return fields
+
+    for selection in node.selection_set.selections:
+        if isinstance(selection, ast.Field):
+            selected = fields.setdefault(selection.name.value, {})
+            selected.update(collect_query_fields(selection, fragments))
+        else:
+            fragment = fragments[selection.name.value] if isinstance(selection, ast.FragmentSpread) else selection
+            for name, selected in collect_query_fields(fragment, fragments).items():
+                fields.setdefault(name, {}).update(selected)
+
+    return fields
+
+
+def get_selected_fields(info):
+    """The fields selected under the current field, mapped to their own selections"""
+    query = {}
+    for node in info.field_asts:
+        for name, selected in collect_query_fields(node, info.fragments).items():
+            query.setdefault(name, {}).update(selected)
+    return query
+
+
+def selects_cursors(info):
+    """Whether a connection field selects the cursor of its edges, or the start or end cursor of its page"""
+    query = get_selected_fields(info)
+    return "cursor" in query.get("edges", {}) or bool(
+        {"startCursor", "endCursor"} & set(query.get("pageInfo", {})))
+
+
+def selects_keys_only(object_type, info):
+    """Whether the nodes of a connection field select nothing but their hash key, their ID and __typename, which
+    the RelationshipResults of a relationship answer without reading their items"""
+    hash_key_name = get_key_name(object_type._meta.model)
+    for name in get_selected_fields(info).get("edges", {}).get("node", {}):
+        name = to_snake_case(name)
+        # fields of other types in fragments, or resolved from the keys like id
+        if name not in object_type._meta.fields or name == object_type._meta.id:
+            continue
+        if name != hash_key_name or hasattr(object_type, "resolve_%s" % name):
+            return False
+    return True
+
+
 def get_query_fields(info):
     """A convenience function to call collect_query_fields with info
     Args:
@@ -51,19 +110,76 @@ def get_query_fields(info):
         dict: Returned from collect_query_fields
     """
 
-    fragments = {}
-    node = ast_to_dict(info.field_nodes[0])
-
-    for name, value in info.fragments.items():
-        fragments[name] = ast_to_dict(value)
-
-    query = collect_query_fields(node, fragments)
+    query = get_selected_fields(info)
     if "edges" in query:
-        return query["edges"]["node"].keys()
+        return query["edges"].get("node", {}).keys()
     return query
 
 
-def is_valid_pynamo_model(model): 
+def get_attributes_to_get(object_type, info):
+    """Builds the projection needed to resolve the fields selected on a PynamoObjectType.
+
+    Returns None, meaning the whole item, when a selected field may read attributes we can not see:
+    a field that is not a model attribute or one with its own resolve_ method.
+    """
+    if info is None:
+        return None
+
+    model = object_type._meta.model
+    model_attributes = model.get_attributes()
+    attributes = set(
+        attr.attr_name for attr in model_attributes.values() if attr.is_hash_key or attr.is_range_key
+    )
+    discriminator = model._get_discriminator_attribute()
+    if discriminator:
+        attributes.add(discriminator.attr_name)
+
+    for name in get_query_fields(info):
+        name = to_snake_case(name)
+        # fields of other types in fragments, or resolved from the keys like id
+        if name not in object_type._meta.fields or name == object_type._meta.id:
+            continue
+        if name not in model_attributes or hasattr(object_type, "resolve_%s" % name):
+            return None
+        attributes.add(model_attributes[name].attr_name)
+
+    return sorted(attributes)
+
+
+def get_context_value(info, name, default=None):
+    """Reads a request scoped setting from info.context, which may be a dict or an object"""
+    context = getattr(info, "context", None)
+    if context is None:
+        return default
+    if isinstance(context, dict):
+        return context.get(name, default)
+    return getattr(context, name, default)
+
+
+def get_request_store(info, name, factory=dict):
+    """Returns the object stored under name in info.context, created by factory on first use.
+
+    Returns None when there is no context, or it can not hold attributes, as nothing outlives the request then.
+    """
+    context = getattr(info, "context", None)
+    if context is None:
+        return None
+    if isinstance(context, dict):
+        if name not in context:
+            context[name] = factory()
+        return context[name]
+
+    store = getattr(context, name, None)
+    if store is None:
+        store = factory()
+        try:
+            setattr(context, name, store)
+        except AttributeError:
+            return None
+    return store
+
+
+def is_valid_pynamo_model(model):
     return model and isclass(model) and issubclass(model, Model)
 
 def get_key_name(model):
@@ -79,28 +195,73 @@ def get_key_name(model):
             return attr.attr_name
 
 
-def connection_for_type(_type):
+def connection_for_type(_type, name=None):
+    """Relay connection of _type with a totalCount, named after the type unless name is given"""
+    connection_name = name or _type._meta.name + "Connection"
+
     class Connection(graphene.relay.Connection):
         total_count = graphene.Int()
 
         class Meta:
-            name = _type._meta.name + "Connection"
+            name = connection_name
             node = _type
 
-        def resolve_total_count(self, args, context, info):
-            return self.total_count if hasattr(self, "total_count") else len(self.edges)
+        def resolve_total_count(self, info):
+            return self.total_count if self.total_count is not None else len(self.edges)
 
     return Connection
 
 
-def to_cursor(item: Model) -> str:
+def serialize_key(model, key):
+    """Serializes a hash key, or a (hash, range) tuple, the way BatchGetItem expects it"""
+    hash_attr = model._hash_key_attribute()
+    range_attr = model._range_key_attribute()
+    if range_attr:
+        hash_key, range_key = model._serialize_keys(key[0], key[1])
+        return {hash_attr.attr_name: hash_key, range_attr.attr_name: range_key}
+    return {hash_attr.attr_name: model._serialize_keys(key)[0]}
+
+
+def get_typed_key(model, raw_key):
+    """Adds the attribute types to a key from serialize_key, {name: {type: value}} as DynamoDB expects it"""
+    attributes = (model._hash_key_attribute(), model._range_key_attribute())
+    types = dict((attr.attr_name, attr.attr_type) for attr in attributes if attr)
+    return dict((name, {types[name]: value}) for name, value in raw_key.items())
+
+
+def get_key_map(model, key):
+    """Key of an item as DynamoDB expects it, for a hash key or a (hash, range) tuple"""
+    return get_typed_key(model, serialize_key(model, key))
+
+
+def get_raw_key(model, key):
+    """Hashable form of a serialized key, for raw items or the result of serialize_key"""
+    return tuple(
+        list(key[attr.attr_name].values())[0] if isinstance(key[attr.attr_name], dict) else key[attr.attr_name]
+        for attr in (model._hash_key_attribute(), model._range_key_attribute()) if attr
+    )
+
+
+def get_last_evaluated_key(item: Model) -> dict:
     data = {}  # this will be same as last_evaluated_key returned by PageIterator
     for name, attr in item.get_attributes().items():
         if attr.is_hash_key or attr.is_range_key:
-            data[name] = item._serialize_value(attr, getattr(item, name))
-    return to_global_id(type(item).__name__, json.dumps(data))
+            # DynamoDB names the keys by their attribute names
+            data[attr.attr_name] = item._serialize_value(attr, getattr(item, name))
+    return data
+
+
+def key_to_cursor(model, last_evaluated_key: dict) -> str:
+    return get_key_codec(model).to_cursor(last_evaluated_key)
+
+
+def to_cursor(item: Model) -> str:
+    return get_key_codec(type(item)).get_cursor(item)
 
 
-def from_cursor(cursor: str) -> Tuple[str, dict]:
-    model, data = from_global_id(cursor)
-    return model, json.loads(data)
+def from_cursor(cursor: str, model=None) -> Tuple[str, dict]:
+    """(model name, decoded cursor). Without model, only the JSON cursors of earlier versions decode"""
+    if model is None:
+        model_name, data = from_global_id(cursor)
+        return model_name, json.loads(data)
+    return model.__name__, get_key_codec(model).from_cursor(cursor)
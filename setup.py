@@ -39,6 +39,9 @@ setup(
         'singledispatch>=3.4.0.3',
         'wrapt>=1.10.8'
     ],
+    extras_require={
+        'asyncio': ['aiohttp>=3.6'],
+    },
     # setup_requires=['pytest-runner'],
     # tests_require=[
     #     'pytest>=3.6',